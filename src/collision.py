@@ -0,0 +1,136 @@
+from typing import Dict, List, Set, Tuple
+import math
+import numpy as np
+from maze import Maze, point_segment_dist, in_tri, shape_box
+
+# Optional continuous collision model
+# The discrete grid still decides where robots move, this engine crashes moving robots
+#   that overlap the true obstacle geometry in RealGraph or another moving robot
+
+BucketLocation = Tuple[int, int]
+ShapeKey = Tuple[str, int] # ('cir' | 'tri' | 'rect', index in the RealGraph list) or ('dyn', obstacle id)
+
+class CollisionEngine:
+    def __init__(self, maze: Maze, cell_size: float = 0.5):
+        self.cell_size = cell_size
+        self.shape_hash: Dict[BucketLocation, List[ShapeKey]] = {}
+        self.robot_cells: Dict[BucketLocation, Set[int]] = {} # uniform cell list of moving robots
+        self.robot_bucket: Dict[int, BucketLocation] = {}
+        self.robots: Dict[int, object] = {}
+        self.obstacle_crashes = 0
+        self.robot_crashes = 0
+        self.crash_log: List[Tuple[float, int, str, float, float]] = [] # t, robot id, kind, x, y
+        self.dynamic_buckets: Dict[int, List[BucketLocation]] = {} # obstacle id -> buckets it is in
+        self.dynamic_version = -1
+        self.build_shape_hash(maze)
+
+    def bucket(self, x: float, y: float) -> BucketLocation:
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def buckets_in_box(self, left: float, bottom: float, right: float, up: float) -> List[BucketLocation]:
+        (i1, h1), (i2, h2) = self.bucket(left, bottom), self.bucket(right, up)
+        return [(i, h) for i in range(i1, i2+1) for h in range(h1, h2+1)]
+
+    def build_shape_hash(self, maze: Maze):
+        # every shape is registered in the buckets covered by its bounding box
+        real_map = maze.real_map
+        for index, (c, r) in enumerate(real_map.circles):
+            for b in self.buckets_in_box(c[0]-r, c[1]-r, c[0]+r, c[1]+r):
+                self.shape_hash.setdefault(b, []).append(('cir', index))
+        for index, tri in enumerate(real_map.triangles):
+            xs, ys = [v[0] for v in tri], [v[1] for v in tri]
+            for b in self.buckets_in_box(min(xs), min(ys), max(xs), max(ys)):
+                self.shape_hash.setdefault(b, []).append(('tri', index))
+        for index, (c1, c2) in enumerate(real_map.rectangles):
+            for b in self.buckets_in_box(min(c1[0], c2[0]), min(c1[1], c2[1]), max(c1[0], c2[0]), max(c1[1], c2[1])):
+                self.shape_hash.setdefault(b, []).append(('rect', index))
+
+    def sync_dynamic(self, maze: Maze):
+        # follow the obstacles added or removed since the last call, only they are rehashed
+        real_map = maze.real_map
+        if self.dynamic_version == real_map.dynamic_version:
+            return
+        for id in [id for id in self.dynamic_buckets if id not in real_map.dynamic]:
+            for b in self.dynamic_buckets.pop(id):
+                self.shape_hash[b].remove(('dyn', id))
+        for id, (kind, geometry) in real_map.dynamic.items():
+            if id not in self.dynamic_buckets:
+                self.dynamic_buckets[id] = self.buckets_in_box(*shape_box(kind, geometry))
+                for b in self.dynamic_buckets[id]:
+                    self.shape_hash.setdefault(b, []).append(('dyn', id))
+        self.dynamic_version = real_map.dynamic_version
+
+    def shape_hit(self, maze: Maze, shape: ShapeKey, loc: np.ndarray, radius: float) -> bool:
+        kind, index = shape
+        if kind == 'dyn':
+            kind, geometry = maze.real_map.dynamic[index]
+        elif kind == 'cir':
+            geometry = maze.real_map.circles[index]
+        elif kind == 'tri':
+            geometry = maze.real_map.triangles[index]
+        else:
+            geometry = maze.real_map.rectangles[index]
+        if kind == 'cir':
+            c, r = geometry
+            return (loc[0]-c[0]) ** 2 + (loc[1]-c[1]) ** 2 < (r + radius) ** 2
+        elif kind == 'tri':
+            tri = geometry
+            p = (loc[0], loc[1])
+            return in_tri(tri, p) or any(point_segment_dist(tri[i], tri[(i+1) % 3], p) < radius for i in range(3))
+        else:
+            (x1, y1), (x2, y2) = geometry
+            dx = max(min(x1, x2) - loc[0], 0.0, loc[0] - max(x1, x2))
+            dy = max(min(y1, y2) - loc[1], 0.0, loc[1] - max(y1, y2))
+            return dx ** 2 + dy ** 2 < radius ** 2
+
+    def update_robot(self, robot):
+        # keep the cell list in sync, only moving robots are tracked
+        id = robot.get_index()
+        old = self.robot_bucket.get(id)
+        if robot.get_status() != 3:
+            if old is not None:
+                self.robot_cells[old].discard(id)
+                del self.robot_bucket[id]
+                del self.robots[id]
+            return
+        loc = robot.get_location()
+        new = self.bucket(loc[0], loc[1])
+        if new != old:
+            if old is not None:
+                self.robot_cells[old].discard(id)
+            self.robot_cells.setdefault(new, set()).add(id)
+            self.robot_bucket[id] = new
+        self.robots[id] = robot
+
+    def detect(self, maze: Maze, t: float) -> int:
+        # check every moving robot against nearby shapes and nearby moving robots
+        self.sync_dynamic(maze)
+        crashed: Dict[int, str] = {}
+        for id, robot in self.robots.items():
+            loc, radius = robot.get_location(), robot.get_radius()
+            for b in self.buckets_in_box(loc[0]-radius, loc[1]-radius, loc[0]+radius, loc[1]+radius):
+                if any(self.shape_hit(maze, shape, loc, radius) for shape in self.shape_hash.get(b, [])):
+                    crashed[id] = 'obstacle'
+                    break
+            reach = 2 * radius
+            for b in self.buckets_in_box(loc[0]-reach, loc[1]-reach, loc[0]+reach, loc[1]+reach):
+                for other_id in self.robot_cells.get(b, ()):
+                    if other_id <= id:
+                        continue
+                    other = self.robots[other_id]
+                    gap = radius + other.get_radius()
+                    if np.sum((other.get_location() - loc) ** 2) < gap ** 2:
+                        crashed.setdefault(id, 'robot')
+                        crashed.setdefault(other_id, 'robot')
+
+        for id, kind in crashed.items():
+            robot = self.robots[id]
+            loc = robot.get_location()
+            self.crash_log.append((t, id, kind, float(loc[0]), float(loc[1])))
+            if kind == 'obstacle':
+                self.obstacle_crashes += 1
+            else:
+                self.robot_crashes += 1
+            robot.crash(maze)
+            self.update_robot(robot)
+        return len(crashed)
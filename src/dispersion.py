@@ -6,7 +6,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon, Rectangle, Circle
 from maze import Maze, SENSORRANGE
-from swarm import MobileRobot, Swarm
+from swarm import MobileRobot, Swarm, SURVIVOR_FOUND
 
 frame_dir = "frames"
 os.makedirs(frame_dir, exist_ok=True)
@@ -22,6 +22,9 @@ width2 = 10
 source2 = [0.25, 13.75]
 
 test_small: bool = False
+continuous_collision: bool = False
+record_heatmap: bool = False # saves heatmap.npz and overlays the dwell time
+live_view: bool = False # run `python live_view.py swarm_live --maze live_maze.pkl` to watch
 
 TIME_INTERVAL = 0.01
 arrow_offset = np.array([[.025, .0], [.0, .025], [-.025, .0], [.0, -.025]])
@@ -48,7 +51,12 @@ ax.set_ylim(0, height)
 # ax.grid()
 ax.set_aspect(1)
 
-def draw_maze(m: Maze, s: Swarm, source: List[float] = [.1, .1]):   
+def draw_maze(m: Maze, s: Swarm, source: List[float] = [.1, .1], heatmap: np.ndarray = None):   
+    # heatmap: optional per-vertex array indexed by [x, y], e.g. from CellHeatmap.export
+    if heatmap is not None:
+        ax.imshow(heatmap.T, origin='lower', cmap='hot', alpha=0.6,
+                  extent=(0, heatmap.shape[0]*m.grid_length, 0, heatmap.shape[1]*m.grid_length))
+
     # define shapes
     cirs = m.get_cirs()
     for circle in cirs:
@@ -62,7 +70,23 @@ def draw_maze(m: Maze, s: Swarm, source: List[float] = [.1, .1]):
         p = np.array([p1, p2, p3])
         ax.add_patch(Polygon(p, edgecolor='xkcd:grey', facecolor='xkcd:grey'))
 
-    ax.add_patch(Rectangle((source[0]-0.08, source[1]-0.08), 0.16, 0.16, edgecolor='xkcd:deep red', facecolor='xkcd:deep red'))
+    rects = m.get_rects() # geometry imported from occupancy bitmaps
+    for rect in rects:
+        (x1, y1), (x2, y2) = rect
+        ax.add_patch(Rectangle((x1, y1), x2-x1, y2-y1, edgecolor='xkcd:grey', facecolor='xkcd:grey'))
+
+    for kind, geometry in m.get_obstacles().values(): # obstacles added during the run
+        if kind == 'cir':
+            ax.add_patch(Circle(geometry[0], geometry[1], edgecolor='xkcd:brown', facecolor='xkcd:brown'))
+        elif kind == 'tri':
+            ax.add_patch(Polygon(np.array(geometry), edgecolor='xkcd:brown', facecolor='xkcd:brown'))
+        else:
+            (x1, y1), (x2, y2) = geometry
+            ax.add_patch(Rectangle((min(x1, x2), min(y1, y2)), abs(x2-x1), abs(y2-y1),
+                                   edgecolor='xkcd:brown', facecolor='xkcd:brown'))
+
+    for src in (s.get_sources() if s.get_sources() else [source]):
+        ax.add_patch(Rectangle((src[0]-0.08, src[1]-0.08), 0.16, 0.16, edgecolor='xkcd:deep red', facecolor='xkcd:deep red'))
 
     # define swarms  
     count = s.get_num()
@@ -216,6 +240,17 @@ if __name__ == '__main__':
         print('drawing the maze...')
         draw_maze(maze, swarm, source=source2)
 
+    maze.freeze(source)
+    if continuous_collision:
+        swarm.enable_collision(maze)
+    if record_heatmap:
+        maze.enable_heatmap()
+    publisher = None
+    if live_view:
+        from live_view import LivePublisher
+        maze.save('live_maze.pkl')
+        publisher = LivePublisher('swarm_live', num_robot, every=10)
+
     # run the simulation
     num_step = int(1000000)
     draw_maze(maze, swarm, source=source)
@@ -237,9 +272,11 @@ if __name__ == '__main__':
         plt.close(fig)
         '''
 
-        found = swarm.rand_step_update(maze)
+        outcome = swarm.rand_step_update(maze)
+        if publisher is not None:
+            publisher.publish(swarm)
         # print(frame)
-        if found:
+        if outcome == SURVIVOR_FOUND:
             print('survivor found')
             for i in range(200): # add some stationary frames at the end
                 fig, ax = plt.subplots(figsize=(10, 10))
@@ -255,6 +292,9 @@ if __name__ == '__main__':
                 plt.close(fig)
                 frame += 1
             break
+        elif outcome:
+            print('dispersion terminated early, outcome code: ', outcome)
+            break
 
         '''
         draw_maze(maze, swarm, source=source)
@@ -262,7 +302,26 @@ if __name__ == '__main__':
         plt.close(fig)
         '''
 
+    if publisher is not None:
+        publisher.close()
+    if maze.heatmap is not None:
+        heat = maze.heatmap.export()
+        np.savez_compressed('heatmap.npz', **heat)
+        fig, ax = plt.subplots(figsize=(10, 10))
+        ax.set_xlim(0, width)
+        ax.set_ylim(0, height)
+        ax.set_aspect(1)
+        draw_maze(maze, swarm, source=source, heatmap=heat['dwell'])
+        plt.savefig('heatmap.png')
+        plt.close(fig)
     print('# activated at least once: ', swarm.count_first_activated())
     print('# crashed: ', swarm.count_crashed())
+    if swarm.collision is not None:
+        print('# obstacle collisions: ', swarm.collision.obstacle_crashes)
+        print('# robot collisions: ', swarm.collision.robot_crashes)
+    if swarm.survivor_found:
+        print('optimal distance to survivor: ', maze.get_optimal_distance())
+        print('path length ratio: ', maze.path_length_ratio(swarm.get_path_to_surv(maze)))
+        print('dispersion efficiency: ', maze.dispersion_efficiency(swarm.count_first_activated()))
     print('for c = 0.2, ct/4 = ',  0.2*swarm.t/4)
 
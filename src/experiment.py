@@ -0,0 +1,70 @@
+from typing import Dict, List
+import copy
+import numpy as np
+from maze import Maze
+from swarm import Swarm, RUNNING
+from result_cache import ResultCache, make_key
+
+# Bump when a change to the simulation makes earlier cached outcomes invalid
+SIM_VERSION = 2
+
+def run_dispersion(maze: Maze, source: List[float], num_robot: int, c: float = .0,
+                   step_length: float = .01, seed: int = None, max_step: int = 1000000,
+                   stagnation_time: float = None, failure_model=None,
+                   progress=None, progress_interval: float = 1.0) -> Dict:
+    # run one dispersion on a copy of the maze and return its outcome record
+    # source may be a list of sources, the robots are then split evenly between them
+    # progress(swarm, maze) is called every progress_interval simulated seconds, returning
+    #   True stops the run early with the outcome RUNNING
+    maze = copy.deepcopy(maze)
+    swarm = Swarm(step_length=step_length, t=.0, stagnation_time=stagnation_time, seed=seed)
+    sources = source if np.ndim(source) == 2 else [source]
+    for k, src in enumerate(sources):
+        swarm.add_robot_batch(num_robot // len(sources) + (k < num_robot % len(sources)), src, c=c)
+    if failure_model is not None:
+        swarm.set_failure_model(failure_model)
+    outcome = RUNNING
+    next_report = progress_interval
+    for _ in range(max_step):
+        outcome = swarm.rand_step_update(maze)
+        if outcome != RUNNING:
+            break
+        if progress is not None and swarm.t >= next_report:
+            next_report += progress_interval
+            if progress(swarm, maze):
+                break
+    return {'outcome': outcome, 't': swarm.t, 'steps': swarm.step_count,
+            'activated': swarm.count_first_activated(), 'crashed': swarm.count_crashed(),
+            'path': [[float(p[0]), float(p[1])] for p in swarm.get_path_to_surv(maze)]}
+
+def run_params(source: List[float], num_robot: int, c: float, step_length: float,
+               seed: int, max_step: int, stagnation_time: float, failure_model=None) -> Dict:
+    # every parameter that changes the outcome of a run, used as the cache key
+    probe = Swarm(step_length=step_length)
+    probe.add_robot_batch(1, [.0, .0])
+    robot = probe.robot_list[0]
+    return {'version': SIM_VERSION, 'source': np.asarray(source, dtype=float).tolist(),
+            'num_robot': num_robot, 'c': c, 'step_length': step_length, 'seed': seed,
+            'max_step': max_step, 'stagnation_time': stagnation_time,
+            'step_per_crash': probe.step_per_crash, 'radius': robot.radius,
+            'speed': robot.speed, 'sensor_range': robot.sensor_range,
+            'failure_model': failure_model.params() if failure_model is not None else None}
+
+def cached_dispersion(cache: ResultCache, maze: Maze, source: List[float], num_robot: int,
+                      c: float = .0, step_length: float = .01, seed: int = None,
+                      max_step: int = 1000000, stagnation_time: float = None,
+                      failure_model=None, maze_hash: str = None) -> Dict:
+    # return the stored outcome of an identical run, or run it and store it
+    # unseeded runs are not reproducible and bypass the cache
+    if seed is None:
+        return run_dispersion(maze, source, num_robot, c, step_length, seed, max_step, stagnation_time, failure_model)
+    if maze_hash is None:
+        maze_hash = maze.content_hash()
+    key = make_key(maze_hash, run_params(source, num_robot, c, step_length, seed, max_step,
+                                         stagnation_time, failure_model))
+    record = cache.get(key)
+    if record is None:
+        record = run_dispersion(maze, source, num_robot, c, step_length, seed, max_step,
+                                stagnation_time, failure_model)
+        cache.put(key, record)
+    return record
@@ -0,0 +1,177 @@
+from typing import Dict, List, Tuple
+import heapq
+import math
+import numpy as np
+from maze import Maze, MAX_NUM
+
+# Failure models for the swarm, replacing the polling of MobileRobot.crash_with_prob
+# Every model draws failure times up front from its own seeded generator and
+#   Swarm.rand_step_update applies the due ones in one pass per step
+# A robot can only crash while active (status 1 or 3, see MobileRobot.crash), so a robot
+#   that is due while outside, at rest or settled survives and draws its next failure time
+#   conditioned on having survived so far
+
+class FailureModel:
+    def __init__(self, seed: int = None):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.events: List[Tuple[float, int]] = [] # heap of (failure time, robot id)
+        self.crash_count = 0
+
+    def params(self) -> Dict:
+        # everything that changes the schedule, used in result cache keys
+        return {'model': type(self).__name__, 'seed': self.seed}
+
+    def failure_times(self, size: int, age: float) -> np.ndarray:
+        # absolute failure times of `size` robots that are still alive at time `age`
+        # the base model never fails a robot, subclasses draw real schedules
+        return np.full(size, np.inf)
+
+    def start(self, swarm):
+        # an unseeded model follows the swarm's seed
+        seed = self.seed if self.seed is not None else int(swarm.rng.integers(2**63))
+        self.rng = np.random.default_rng(seed)
+        ids = [robot.get_index() for robot in swarm.robot_list]
+        self.events = list(zip(self.failure_times(len(ids), swarm.t).tolist(), ids))
+        heapq.heapify(self.events)
+        self.crash_count = 0
+
+    def pending(self) -> bool:
+        # whether a failure is still scheduled at a finite time
+        return bool(self.events) and self.events[0][0] < np.inf
+
+    def apply(self, swarm, maze: Maze) -> int:
+        survivors = []
+        crashed = 0
+        while self.events and self.events[0][0] <= swarm.t:
+            _, id = heapq.heappop(self.events)
+            robot = swarm.robot_list[id-1]
+            status = robot.get_status()
+            if status == 1 or status == 3:
+                robot.crash(maze)
+                crashed += 1
+            elif status != -1:
+                survivors.append(id)
+        if survivors:
+            for t, id in zip(self.failure_times(len(survivors), swarm.t).tolist(), survivors):
+                heapq.heappush(self.events, (t, id))
+        self.crash_count += crashed
+        return crashed
+
+class BernoulliFailure(FailureModel):
+    # every `interval` seconds each robot crashes with probability c, as crash_with_prob did
+    def __init__(self, c: float, interval: float = 30.0, seed: int = None):
+        super().__init__(seed)
+        self.c = c
+        self.interval = interval
+
+    def params(self) -> Dict:
+        return {**super().params(), 'c': self.c, 'interval': self.interval}
+
+    def failure_times(self, size: int, age: float) -> np.ndarray:
+        if self.c <= 0:
+            return np.full(size, np.inf)
+        checks = self.rng.geometric(min(self.c, 1.0), size=size)
+        return (math.floor(age / self.interval + 1e-9) + checks) * self.interval
+
+class ExponentialFailure(FailureModel):
+    # constant hazard `rate` per second
+    def __init__(self, rate: float, seed: int = None):
+        super().__init__(seed)
+        self.rate = rate
+
+    def params(self) -> Dict:
+        return {**super().params(), 'rate': self.rate}
+
+    def failure_times(self, size: int, age: float) -> np.ndarray:
+        if self.rate <= 0:
+            return np.full(size, np.inf)
+        return age + self.rng.exponential(1.0 / self.rate, size=size)
+
+class WeibullFailure(FailureModel):
+    # wear-out with lifetime ~ Weibull(shape, scale), the age is the simulation time
+    def __init__(self, shape: float, scale: float, seed: int = None):
+        super().__init__(seed)
+        self.shape = shape
+        self.scale = scale
+
+    def params(self) -> Dict:
+        return {**super().params(), 'shape': self.shape, 'scale': self.scale}
+
+    def failure_times(self, size: int, age: float) -> np.ndarray:
+        # inverse of the survival function conditioned on surviving to `age`
+        u = self.rng.random(size)
+        return self.scale * ((age / self.scale) ** self.shape - np.log(u)) ** (1.0 / self.shape)
+
+class HazardZones(FailureModel):
+    # spatially correlated failures: every zone (x, y, radius, rate) is hit at the times of
+    #   a Poisson process, crashing all the active robots inside it at once
+    def __init__(self, zones: List[Tuple[float, float, float, float]], seed: int = None):
+        super().__init__(seed)
+        self.zones = zones
+        self.zone_cells: List[List[Tuple[int, int]]] = []
+
+    def params(self) -> Dict:
+        return {**super().params(), 'zones': [list(zone) for zone in self.zones]}
+
+    def zone_time(self, zone: int, age: float) -> float:
+        rate = self.zones[zone][3]
+        return age + self.rng.exponential(1.0 / rate) if rate > 0 else np.inf
+
+    def start(self, swarm):
+        seed = self.seed if self.seed is not None else int(swarm.rng.integers(2**63))
+        self.rng = np.random.default_rng(seed)
+        self.zone_cells = []
+        self.events = [(self.zone_time(k, swarm.t), k) for k in range(len(self.zones))]
+        heapq.heapify(self.events)
+        self.crash_count = 0
+
+    def cells_in_zone(self, maze: Maze, zone: int) -> List[Tuple[int, int]]:
+        x, y, r, _ = self.zones[zone]
+        gl = maze.grid_length
+        cells = []
+        for i in range(max(0, int((x-r) // gl)), min(maze.grids.width, int((x+r) // gl) + 1)):
+            for h in range(max(0, int((y-r) // gl)), min(maze.grids.height, int((y+r) // gl) + 1)):
+                if (gl*(i+0.5) - x) ** 2 + (gl*(h+0.5) - y) ** 2 < r ** 2:
+                    cells.append((i, h))
+        return cells
+
+    def apply(self, swarm, maze: Maze) -> int:
+        if not self.zone_cells:
+            self.zone_cells = [self.cells_in_zone(maze, k) for k in range(len(self.zones))]
+        crashed = 0
+        while self.events and self.events[0][0] <= swarm.t:
+            _, zone = heapq.heappop(self.events)
+            # the grid marks tell which robots are inside, no robot is polled
+            for cell in self.zone_cells[zone]:
+                for mark in list(maze.grids.marks[cell]):
+                    if 0 < mark < MAX_NUM:
+                        robot = swarm.robot_list[mark-1]
+                        if robot.get_status() == 1 or robot.get_status() == 3:
+                            robot.crash(maze)
+                            crashed += 1
+            heapq.heappush(self.events, (self.zone_time(zone, swarm.t), zone))
+        self.crash_count += crashed
+        return crashed
+
+class CombinedFailure(FailureModel):
+    # several independent failure models applied together
+    def __init__(self, models: List[FailureModel]):
+        super().__init__(None)
+        self.models = models
+
+    def params(self) -> Dict:
+        return {'model': type(self).__name__, 'models': [model.params() for model in self.models]}
+
+    def start(self, swarm):
+        for model in self.models:
+            model.start(swarm)
+        self.crash_count = 0
+
+    def pending(self) -> bool:
+        return any(model.pending() for model in self.models)
+
+    def apply(self, swarm, maze: Maze) -> int:
+        crashed = sum(model.apply(swarm, maze) for model in self.models)
+        self.crash_count += crashed
+        return crashed
@@ -0,0 +1,333 @@
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing as mp
+import os
+import traceback
+from maze import Maze
+
+# Local dispersion job service
+# Clients talk JSON lines over a Unix socket (or localhost TCP), one request per line:
+#   {"op": "submit", "maze": {...}, "params": {...}, "watch": true} -> {"job": id, "state": "queued"}
+#   {"op": "watch", "job": id}   -> progress lines {"job", "state": "running", "t", "coverage"}
+#                                   until {"job", "state": "done" | "cancelled" | "failed", ...}
+#   {"op": "cancel", "job": id}  -> {"job", "state"}
+#   {"op": "status"}             -> {"jobs": [...], "workers": n, "queued": n}
+# maze is {"kind": ..., "params": {...}} for maze_gen.generate, or {"path": ...} for a maze
+#   saved with Maze.save_geometry (.npz), pickled mazes are not loaded from the wire
+# params are the keyword arguments of experiment.run_dispersion (source, num_robot, c, seed, ...)
+# Jobs run in long-lived worker processes that keep recently used mazes compiled, and a job
+#   goes preferably to an idle worker that already holds its maze
+# usage: python job_server.py serve --socket /tmp/dispersion.sock --workers 4
+#        python job_server.py submit job.json --socket /tmp/dispersion.sock
+
+FINAL_STATES = ('done', 'cancelled', 'failed')
+
+def maze_key(spec: Dict) -> str:
+    return json.dumps(spec, sort_keys=True)
+
+def build_maze(spec: Dict, cache_dir: str = None):
+    # compile the maze of a job, returns (maze, default source or None)
+    if 'path' in spec:
+        if not spec['path'].endswith('.npz'):
+            raise ValueError('only .npz mazes saved with Maze.save_geometry are accepted')
+        maze = Maze.load_geometry(spec['path'])
+        return maze, list(maze.source[0]) if maze.source else None
+    from maze_gen import generate
+    return generate(spec['kind'], cache_dir=cache_dir, **spec.get('params', {}))
+
+def worker_main(index: int, conn, cancel, cache_dir: str, maze_slots: int):
+    # worker process loop: receive a job, run it, report progress and the outcome
+    from experiment import run_dispersion
+    mazes = collections.OrderedDict() # maze key -> (maze, default source), least recent first
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        job_id = job['job']
+        try:
+            key = maze_key(job['maze'])
+            if key not in mazes:
+                mazes[key] = build_maze(job['maze'], cache_dir)
+                while len(mazes) > maze_slots:
+                    mazes.popitem(last=False)
+            mazes.move_to_end(key)
+            maze, default_source = mazes[key]
+            params = dict(job.get('params', {}))
+            params.setdefault('source', default_source)
+
+            def progress(swarm, maze):
+                conn.send(('progress', job_id, {'t': swarm.t, 'coverage': swarm.get_coverage(maze),
+                                                'steps': swarm.step_count}))
+                return cancel[index] == job_id
+
+            record = run_dispersion(maze, progress=progress, **params)
+            state = 'cancelled' if cancel[index] == job_id else 'done'
+            conn.send((state, job_id, record))
+        except Exception:
+            conn.send(('failed', job_id, traceback.format_exc()))
+
+class Job:
+    def __init__(self, id: int, maze: Dict, params: Dict):
+        self.id = id
+        self.maze = maze
+        self.key = maze_key(maze)
+        self.params = params
+        self.state = 'queued'
+        self.worker: Optional[int] = None
+        self.progress: Dict = {}
+        self.result = None
+        self.watchers: List[asyncio.Queue] = []
+
+    def info(self) -> Dict:
+        info = {'job': self.id, 'state': self.state, **self.progress}
+        if self.state == 'done' or self.state == 'cancelled':
+            info['result'] = self.result
+        elif self.state == 'failed':
+            info['error'] = self.result
+        return info
+
+    def notify(self):
+        info = self.info()
+        for queue in self.watchers:
+            queue.put_nowait(info)
+
+class JobServer:
+    def __init__(self, workers: int = None, cache_dir: str = None, maze_slots: int = 4,
+                 history: int = 1000):
+        self.num_workers = workers if workers else os.cpu_count()
+        self.cache_dir = cache_dir
+        self.maze_slots = maze_slots
+        self.history = history
+        self.context = mp.get_context('spawn')
+        # job id being cancelled on each worker, polled by the worker at every progress report
+        self.cancel = self.context.Array('q', self.num_workers, lock=False)
+        self.processes: List = [None] * self.num_workers
+        self.conns: List = [None] * self.num_workers
+        self.running: List[Optional[Job]] = [None] * self.num_workers
+        self.warm: List[List[str]] = [[] for _ in range(self.num_workers)] # maze keys, most recent last
+        self.jobs: Dict[int, Job] = {}
+        self.queue: collections.deque = collections.deque()
+        self.next_id = 1
+
+    def start_worker(self, index: int):
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=worker_main, daemon=True,
+                                       args=(index, child, self.cancel, self.cache_dir, self.maze_slots))
+        process.start()
+        child.close()
+        self.processes[index] = process
+        self.conns[index] = parent
+        self.warm[index] = []
+        asyncio.get_running_loop().add_reader(parent.fileno(), self.on_message, index)
+
+    def on_message(self, index: int):
+        conn = self.conns[index]
+        try:
+            while conn.poll():
+                kind, job_id, payload = conn.recv()
+                job = self.jobs.get(job_id)
+                if job is None:
+                    continue
+                if kind == 'progress':
+                    job.progress = payload
+                    job.notify()
+                else:
+                    self.finish(index, job, kind, payload)
+        except (EOFError, OSError):
+            # the worker died, fail its job and replace it
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+            conn.close()
+            job = self.running[index]
+            if job is not None:
+                self.finish(index, job, 'failed', 'worker process exited')
+            self.start_worker(index)
+            self.dispatch()
+
+    def finish(self, index: int, job: Job, state: str, payload):
+        job.state = state
+        job.result = payload
+        job.worker = None
+        self.running[index] = None
+        self.cancel[index] = 0
+        job.notify()
+        self.forget_old_jobs()
+        self.dispatch()
+
+    def forget_old_jobs(self):
+        finished = [id for id, job in self.jobs.items() if job.state in FINAL_STATES and not job.watchers]
+        for id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[id]
+
+    def submit(self, maze: Dict, params: Dict) -> Job:
+        job = Job(self.next_id, maze, params)
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self.queue.append(job)
+        self.dispatch()
+        return job
+
+    def dispatch(self):
+        # give queued jobs to idle workers, preferring a worker that already holds the maze
+        while self.queue:
+            idle = [k for k in range(self.num_workers) if self.running[k] is None]
+            if not idle:
+                return
+            job = self.queue.popleft()
+            warm = [k for k in idle if job.key in self.warm[k]]
+            # otherwise the idle worker holding the fewest mazes
+            index = warm[0] if warm else min(idle, key=lambda k: len(self.warm[k]))
+            if job.key in self.warm[index]:
+                self.warm[index].remove(job.key)
+            self.warm[index] = (self.warm[index] + [job.key])[-self.maze_slots:]
+            job.state = 'running'
+            job.worker = index
+            self.running[index] = job
+            self.conns[index].send({'job': job.id, 'maze': job.maze, 'params': job.params})
+            job.notify()
+
+    def cancel_job(self, job: Job):
+        if job.state == 'queued':
+            self.queue.remove(job)
+            job.state = 'cancelled'
+            job.notify()
+        elif job.state == 'running':
+            # the worker stops at its next progress report and sends back the partial record
+            self.cancel[job.worker] = job.id
+
+    async def watch(self, job: Job, writer: asyncio.StreamWriter):
+        queue = asyncio.Queue()
+        job.watchers.append(queue)
+        try:
+            info = job.info()
+            while True:
+                writer.write((json.dumps(info) + '\n').encode())
+                await writer.drain()
+                if info['state'] in FINAL_STATES:
+                    return
+                info = await queue.get()
+                # only the newest progress matters to a slow client
+                while not queue.empty() and info['state'] == 'running':
+                    info = queue.get_nowait()
+        finally:
+            job.watchers.remove(queue)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    request = json.loads(line)
+                    reply = await self.serve_request(request, writer)
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'error': '{0}: {1}'.format(type(e).__name__, e)}
+                if reply is not None:
+                    writer.write((json.dumps(reply) + '\n').encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_request(self, request: Dict, writer: asyncio.StreamWriter) -> Optional[Dict]:
+        op = request['op']
+        if op == 'submit':
+            job = self.submit(request['maze'], request.get('params', {}))
+            if request.get('watch'):
+                await self.watch(job, writer)
+                return None
+            return {'job': job.id, 'state': job.state}
+        if op == 'status':
+            return {'jobs': [job.info() for job in self.jobs.values() if job.state not in FINAL_STATES],
+                    'workers': self.num_workers, 'queued': len(self.queue)}
+        if op != 'watch' and op != 'cancel':
+            raise ValueError('unknown op ' + str(op))
+        job = self.jobs[request['job']]
+        if op == 'watch':
+            await self.watch(job, writer)
+            return None
+        self.cancel_job(job)
+        return {'job': job.id, 'state': job.state}
+
+    async def serve(self, socket_path: str = None, host: str = '127.0.0.1', port: int = None):
+        for index in range(self.num_workers):
+            self.start_worker(index)
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for index, conn in enumerate(self.conns):
+                asyncio.get_running_loop().remove_reader(conn.fileno())
+                conn.send(None)
+                self.processes[index].join(timeout=1.0)
+                if self.processes[index].is_alive():
+                    self.processes[index].terminate()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+async def request(message: Dict, socket_path: str = None, host: str = '127.0.0.1', port: int = None):
+    # client side: send one request and yield its replies until the job is over
+    if socket_path is not None:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((json.dumps(message) + '\n').encode())
+        await writer.drain()
+        streaming = message['op'] == 'watch' or (message['op'] == 'submit' and message.get('watch'))
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            reply = json.loads(line)
+            yield reply
+            if not streaming or 'error' in reply or reply.get('state') in FINAL_STATES:
+                return
+    finally:
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='local dispersion job server')
+    parser.add_argument('command', choices=['serve', 'submit', 'watch', 'cancel', 'status'])
+    parser.add_argument('arg', nargs='?', help='job file (JSON with maze and params) or job id')
+    parser.add_argument('--socket', default='/tmp/dispersion.sock')
+    parser.add_argument('--port', type=int, help='listen on localhost TCP instead of the socket')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache-dir', help='generated maze cache')
+    args = parser.parse_args()
+    socket_path = None if args.port else args.socket
+
+    if args.command == 'serve':
+        server = JobServer(workers=args.workers, cache_dir=args.cache_dir)
+        try:
+            asyncio.run(server.serve(socket_path, port=args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.command == 'submit':
+        with open(args.arg) as f:
+            message = {'op': 'submit', 'watch': True, **json.load(f)}
+    elif args.command == 'status':
+        message = {'op': 'status'}
+    else:
+        message = {'op': args.command, 'job': int(args.arg)}
+
+    async def run():
+        async for reply in request(message, socket_path, port=args.port):
+            print(json.dumps(reply))
+
+    asyncio.run(run())
+
+if __name__ == '__main__':
+    main()
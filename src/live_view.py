@@ -0,0 +1,134 @@
+from typing import Dict, Optional
+import argparse
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+# Live monitoring of a running dispersion
+# The simulation publishes robot arrays into a shared-memory ring buffer every few steps
+#   without waiting for anybody, and a separate viewer process draws the newest complete
+#   frame at its own rate, frames it is too slow for are simply skipped
+# usage: python live_view.py <name> --maze <maze saved with Maze.save>
+
+HEADER_DTYPE = np.dtype([('seq', 'i8'), ('capacity', 'i8'), ('slots', 'i8')])
+
+def slot_dtype(capacity: int) -> np.dtype:
+    # begin and end carry the frame number, a slot is consistent only when they match
+    return np.dtype([('begin', 'i8'), ('t', 'f8'), ('n', 'i8'),
+                     ('x', 'f4', capacity), ('y', 'f4', capacity),
+                     ('status', 'i1', capacity), ('direction', 'i1', capacity), ('end', 'i8')])
+
+class LivePublisher:
+    def __init__(self, name: str, capacity: int, slots: int = 4, every: int = 10):
+        self.every = every
+        dtype = slot_dtype(capacity)
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=HEADER_DTYPE.itemsize + slots * dtype.itemsize)
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.ring = np.ndarray((slots,), dtype=dtype, buffer=self.shm.buf, offset=HEADER_DTYPE.itemsize)
+        self.header['seq'] = 0
+        self.header['capacity'] = capacity
+        self.header['slots'] = slots
+        self.capacity = capacity
+        self.seq = 0
+
+    def publish(self, swarm):
+        # write the robots that have entered the maze into the next slot, every `every` steps
+        if swarm.step_count % self.every != 0:
+            return
+        robots = [swarm.robot_list[id-1] for id in swarm.entered[:self.capacity]]
+        self.seq += 1
+        slot = self.ring[self.seq % len(self.ring)]
+        slot['begin'] = self.seq
+        n = len(robots)
+        if n:
+            locs = np.array([robot.get_location() for robot in robots], dtype=np.float32)
+            slot['x'][:n] = locs[:, 0]
+            slot['y'][:n] = locs[:, 1]
+            slot['status'][:n] = [robot.get_status() for robot in robots]
+            slot['direction'][:n] = [robot.get_direction() for robot in robots]
+        slot['n'] = n
+        slot['t'] = swarm.t
+        slot['end'] = self.seq
+        self.header['seq'] = self.seq
+
+    def close(self):
+        del self.header, self.ring
+        self.shm.close()
+        self.shm.unlink()
+
+class LiveReader:
+    def __init__(self, name: str):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError: # before python 3.13 the tracker would unlink the publisher's buffer on exit
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        dtype = slot_dtype(int(self.header['capacity']))
+        self.ring = np.ndarray((int(self.header['slots']),), dtype=dtype,
+                               buffer=self.shm.buf, offset=HEADER_DTYPE.itemsize)
+        self.last_seq = 0
+
+    def latest(self) -> Optional[Dict[str, np.ndarray]]:
+        # copy the newest complete frame, None if nothing new or it was overwritten meanwhile
+        seq = int(self.header['seq'])
+        if seq == self.last_seq:
+            return None
+        slot = self.ring[seq % len(self.ring)]
+        end = int(slot['end'])
+        n = int(slot['n'])
+        frame = {'t': float(slot['t']), 'x': slot['x'][:n].copy(), 'y': slot['y'][:n].copy(),
+                 'status': slot['status'][:n].copy(), 'direction': slot['direction'][:n].copy()}
+        if end != seq or int(slot['begin']) != seq:
+            return None
+        self.last_seq = seq
+        return frame
+
+    def close(self):
+        del self.header, self.ring
+        self.shm.close()
+
+STATUS_COLORS = {-1: 'xkcd:grey', 0: 'black', 1: 'black', 2: 'xkcd:light blue', 3: 'xkcd:orange'}
+
+def main():
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    from matplotlib.patches import Polygon, Rectangle, Circle
+    from maze import Maze
+
+    parser = argparse.ArgumentParser(description='live viewer of a dispersion run')
+    parser.add_argument('name', help='shared memory name given to LivePublisher')
+    parser.add_argument('--maze', help='maze saved with Maze.save, drawn as background')
+    parser.add_argument('--fps', type=float, default=10.0)
+    args = parser.parse_args()
+
+    reader = LiveReader(args.name)
+    fig, ax = plt.subplots(figsize=(10, 10))
+    ax.set_aspect(1)
+    if args.maze:
+        maze = Maze.load(args.maze)
+        ax.set_xlim(0, maze.get_width())
+        ax.set_ylim(0, maze.get_height())
+        for circle in maze.get_cirs():
+            ax.add_patch(Circle(circle[0], circle[1], edgecolor='xkcd:grey', facecolor='xkcd:grey'))
+        for triangle in maze.get_tris():
+            ax.add_patch(Polygon(np.array(triangle), edgecolor='xkcd:grey', facecolor='xkcd:grey'))
+        for (x1, y1), (x2, y2) in maze.get_rects():
+            ax.add_patch(Rectangle((x1, y1), x2-x1, y2-y1, edgecolor='xkcd:grey', facecolor='xkcd:grey'))
+    robots = ax.scatter([], [], s=12)
+    title = ax.set_title('waiting for the simulation')
+
+    def update(_):
+        frame = reader.latest()
+        if frame is not None:
+            robots.set_offsets(np.column_stack([frame['x'], frame['y']]))
+            robots.set_color([STATUS_COLORS.get(int(s), 'black') for s in frame['status']])
+            title.set_text('{0:.2f} s, {1} robots'.format(frame['t'], len(frame['x'])))
+        return robots, title
+
+    animation = FuncAnimation(fig, update, interval=1000.0/args.fps, cache_frame_data=False)
+    plt.show()
+    reader.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
-from typing import Dict, List, Iterator, Tuple, TypeVar
+from typing import Dict, List, Iterator, Set, Tuple, TypeVar
 from collections import deque
+import hashlib
 import heapq
+import json
+import math
+import pickle
 import numpy as np
 
 # Assumption: Less than MAX_NUM robots
@@ -62,6 +66,70 @@ def in_tri_margin(x1: float, y1: float, x2: float, y2: float,
         or point_segment_dist((x1,y1), (x3,y3), (x,y)) < margin \
         or point_segment_dist((x2,y2), (x3,y3), (x,y)) < margin
     
+def point_segment_dist_grid(ver_1: PointLocation, ver_2: PointLocation, px: np.ndarray, py: np.ndarray) -> np.ndarray:
+    # point_segment_dist for arrays of points
+    ax, ay = ver_2[0] - ver_1[0], ver_2[1] - ver_1[1]
+    b1x, b1y = px - ver_1[0], py - ver_1[1]
+    b2x, b2y = px - ver_2[0], py - ver_2[1]
+    length = math.hypot(ax, ay)
+    if length < 0.001:
+        return np.hypot(b1x, b1y)
+    line = np.abs(ax * b1y - ay * b1x) / length
+    return np.where(ax*b1x + ay*b1y < -0.001, np.hypot(b1x, b1y),
+                    np.where(-ax*b2x - ay*b2y < -0.001, np.hypot(b2x, b2y), line))
+
+def in_tri_margin_grid(x1: float, y1: float, x2: float, y2: float,
+                       x3: float, y3: float, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # in_tri_margin for arrays of points
+    margin = ROBOT_RADIUS
+    A = tri_area(x1, y1, x2, y2, x3, y3)
+    A1 = tri_area(x, y, x2, y2, x3, y3)
+    A2 = tri_area(x1, y1, x, y, x3, y3)
+    A3 = tri_area(x1, y1, x2, y2, x, y)
+    return (np.abs(A - A1 - A2 - A3) < 0.001) \
+        | (point_segment_dist_grid((x1,y1), (x2,y2), x, y) < margin) \
+        | (point_segment_dist_grid((x1,y1), (x3,y3), x, y) < margin) \
+        | (point_segment_dist_grid((x2,y2), (x3,y3), x, y) < margin)
+
+def segments_intersect(p1: PointLocation, p2: PointLocation, q1: PointLocation, q2: PointLocation) -> bool:
+    def orient(a, b, c):
+        return (b[0]-a[0])*(c[1]-a[1]) - (b[1]-a[1])*(c[0]-a[0])
+    d1, d2 = orient(q1, q2, p1), orient(q1, q2, p2)
+    d3, d4 = orient(p1, p2, q1), orient(p1, p2, q2)
+    return d1*d2 < 0 and d3*d4 < 0
+
+def in_tri(tri: TriLocation, p: PointLocation) -> bool:
+    (x1, y1), (x2, y2), (x3, y3) = tri
+    A = tri_area(x1, y1, x2, y2, x3, y3)
+    A1 = tri_area(p[0], p[1], x2, y2, x3, y3)
+    A2 = tri_area(x1, y1, p[0], p[1], x3, y3)
+    A3 = tri_area(x1, y1, x2, y2, p[0], p[1])
+    return abs(A - A1 - A2 - A3) < 0.001
+
+def shape_box(kind: str, geometry) -> Tuple[float, float, float, float]:
+    # left, bottom, right, up of a 'cir', 'tri' or 'rect' shape
+    if kind == 'cir':
+        (x, y), r = geometry
+        return x-r, y-r, x+r, y+r
+    xs, ys = [p[0] for p in geometry], [p[1] for p in geometry]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def load_occupancy(image, threshold: float = 0.5) -> np.ndarray:
+    # read an occupancy image (PNG path or array) as a boolean array, True where occupied
+    # boolean arrays are used as they are, otherwise dark pixels (< threshold) are obstacles
+    if isinstance(image, str):
+        import matplotlib.image as mpimg
+        image = mpimg.imread(image)
+    image = np.asarray(image)
+    if image.dtype == bool:
+        return image
+    image = image.astype(np.float32)
+    if image.ndim == 3:
+        image = image[:, :, :3].mean(axis=2)
+    if image.max() > 1.0:
+        image = image / 255.0
+    return image < threshold
+
 # ---------- Classes ----------
 # Continuous Graph
 class RealGraph:
@@ -73,6 +141,9 @@ class RealGraph:
         self.circles: List[CircleLocation] = []
         self.triangles: List[TriLocation] = []
         self.points: List[PointLocation] = []
+        # obstacles added or removed during a run, obstacle id -> ('cir' | 'tri' | 'rect', geometry)
+        self.dynamic: Dict[int, Tuple[str, object]] = {}
+        self.dynamic_version = 0
 
     def add_cir(self, x: float, y: float, r: float):
         if x-r < x+r and y-r < y+r:
@@ -80,6 +151,35 @@ class RealGraph:
     
     def add_tri(self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float):
         self.triangles.append(((x1, y1), (x2, y2), (x3, y3)))
+
+    def add_rect(self, x1: float, y1: float, x2: float, y2: float):
+        self.rectangles.append(((x1, y1), (x2, y2)))
+
+    def segment_blocked(self, p: PointLocation, q: PointLocation) -> bool:
+        # whether the segment pq crosses any obstacle, used for line of sight
+        left, right = min(p[0], q[0]), max(p[0], q[0])
+        bottom, up = min(p[1], q[1]), max(p[1], q[1])
+        circles = self.circles + [g for kind, g in self.dynamic.values() if kind == 'cir']
+        for (c, r) in circles:
+            if c[0]+r < left or c[0]-r > right or c[1]+r < bottom or c[1]-r > up:
+                continue
+            if point_segment_dist(p, q, c) < r:
+                return True
+        rect_tris = []
+        rects = self.rectangles + [g for kind, g in self.dynamic.values() if kind == 'rect']
+        for (c1, c2) in rects:
+            rect_tris.append((c1, c2, (c1[0], c2[1])))
+            rect_tris.append((c1, c2, (c2[0], c1[1])))
+        tris = self.triangles + [g for kind, g in self.dynamic.values() if kind == 'tri']
+        for tri in tris + rect_tris:
+            xs, ys = [v[0] for v in tri], [v[1] for v in tri]
+            if max(xs) < left or min(xs) > right or max(ys) < bottom or min(ys) > up:
+                continue
+            if in_tri(tri, p) or in_tri(tri, q):
+                return True
+            if any(segments_intersect(p, q, tri[i], tri[(i+1) % 3]) for i in range(3)):
+                return True
+        return False
     
 # Discrete graph
 class SquareGrid:
@@ -87,7 +187,7 @@ class SquareGrid:
         self.width = width
         self.height = height
         self.grid_length = grid_length
-        self.walls: List[GridLocation] = []
+        self.walls: Set[GridLocation] = set()
         self.points: List[Tuple[int, int]] = []
     
     def in_bounds(self, id: GridLocation):
@@ -96,7 +196,134 @@ class SquareGrid:
     
     def passable(self, id):
         return id not in self.walls
+
+    def count_passable(self) -> int:
+        return self.width * self.height - len(self.walls)
     
+    def wall_mask(self) -> np.ndarray:
+        # boolean array indexed by [x, y], True on walls
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        if self.walls:
+            cells = np.array(list(self.walls), dtype=int)
+            mask[cells[:, 0], cells[:, 1]] = True
+        return mask
+
+    def distance_field(self, starts: List[GridLocation], diagonal: bool = True) -> np.ndarray:
+        # shortest distance (in metres) from the nearest start to every vertex, np.inf if unreachable
+        # BFS over 4 neighbors, or Dijkstra with diagonal moves that do not cut wall corners
+        blocked = self.wall_mask()
+        dist = np.full((self.width, self.height), np.inf)
+        starts = [start for start in starts if self.in_bounds(start) and not blocked[start]]
+        for start in starts:
+            dist[start] = 0.0
+        straight = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+        if not diagonal:
+            frontier = deque(starts)
+            while frontier:
+                (x, y) = frontier.popleft()
+                for dx, dy in straight:
+                    nx, ny = x+dx, y+dy
+                    if 0 <= nx < self.width and 0 <= ny < self.height \
+                        and not blocked[nx, ny] and dist[nx, ny] == np.inf:
+                        dist[nx, ny] = dist[x, y] + self.grid_length
+                        frontier.append((nx, ny))
+            return dist
+
+        diag_length = math.sqrt(2) * self.grid_length
+        heap = [(0.0, start) for start in starts]
+        while heap:
+            d, (x, y) = heapq.heappop(heap)
+            if d > dist[x, y]:
+                continue
+            for dx, dy in straight + [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+                nx, ny = x+dx, y+dy
+                if not (0 <= nx < self.width and 0 <= ny < self.height) or blocked[nx, ny]:
+                    continue
+                if dx != 0 and dy != 0:
+                    if blocked[x+dx, y] or blocked[x, y+dy]:
+                        continue
+                    nd = d + diag_length
+                else:
+                    nd = d + self.grid_length
+                if nd < dist[nx, ny]:
+                    dist[nx, ny] = nd
+                    heapq.heappush(heap, (nd, (nx, ny)))
+        return dist
+
+    def step_cost(self, x: int, y: int, dx: int, dy: int) -> float:
+        # length of the move from (x, y) by (dx, dy), np.inf if a wall is in the way
+        nx, ny = x+dx, y+dy
+        if not (0 <= nx < self.width and 0 <= ny < self.height) or (nx, ny) in self.walls:
+            return np.inf
+        if dx != 0 and dy != 0:
+            if (x+dx, y) in self.walls or (x, y+dy) in self.walls:
+                return np.inf
+            return math.sqrt(2) * self.grid_length
+        return self.grid_length
+
+    def repair_distance_field(self, dist: np.ndarray, starts: List[GridLocation], added: List[GridLocation],
+                              removed: List[GridLocation], diagonal: bool = True):
+        # update a distance_field in place after the vertices in `added` became walls and
+        #   those in `removed` stopped being walls, touching only vertices whose distance changes
+        moves = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+        if diagonal:
+            moves += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        starts = {start for start in starts if self.in_bounds(start)}
+        eps = 1e-9
+
+        # invalidate, in increasing distance, every vertex left without a neighbor its distance came from
+        # a new wall also cuts the diagonal moves between its 4 neighbors, so they are checked too
+        check, invalid = [], []
+        def push_neighbors(x, y):
+            for dx, dy in moves:
+                nx, ny = x+dx, y+dy
+                if 0 <= nx < self.width and 0 <= ny < self.height and dist[nx, ny] < np.inf:
+                    heapq.heappush(check, (dist[nx, ny], (nx, ny)))
+        for (x, y) in added:
+            if dist[x, y] < np.inf:
+                dist[x, y] = np.inf
+                invalid.append((x, y))
+            push_neighbors(x, y)
+        while check:
+            d, (x, y) = heapq.heappop(check)
+            if dist[x, y] != d or (x, y) in starts:
+                continue
+            if any(abs(dist[x+dx, y+dy] + cost - d) < eps for dx, dy in moves
+                   for cost in [self.step_cost(x, y, dx, dy)] if cost < np.inf):
+                continue
+            dist[x, y] = np.inf
+            invalid.append((x, y))
+            push_neighbors(x, y)
+
+        # relax outward from the invalidated vertices, the opened vertices and their neighbors
+        heap = []
+        def best_from_neighbors(x, y):
+            if (x, y) in starts:
+                return 0.0
+            costs = [dist[x+dx, y+dy] + cost for dx, dy in moves
+                     for cost in [self.step_cost(x, y, dx, dy)] if cost < np.inf]
+            return min(costs + [np.inf])
+        for (x, y) in invalid + list(removed):
+            if (x, y) in self.walls:
+                continue
+            dist[x, y] = best_from_neighbors(x, y)
+            if dist[x, y] < np.inf:
+                heapq.heappush(heap, (dist[x, y], (x, y)))
+        for (x, y) in removed:
+            for dx, dy in moves:
+                nx, ny = x+dx, y+dy
+                if 0 <= nx < self.width and 0 <= ny < self.height and dist[nx, ny] < np.inf:
+                    heapq.heappush(heap, (dist[nx, ny], (nx, ny)))
+        while heap:
+            d, (x, y) = heapq.heappop(heap)
+            if d > dist[x, y]:
+                continue
+            for dx, dy in moves:
+                nd = d + self.step_cost(x, y, dx, dy)
+                if nd < np.inf and nd < dist[x+dx, y+dy] - eps:
+                    dist[x+dx, y+dy] = nd
+                    heapq.heappush(heap, (nd, (x+dx, y+dy)))
+
     def four_neighbors(self, id):
         (x, y) = id
         four_neighbors = [(x-1, y), (x, y+1), (x+1, y), (x, y-1)]
@@ -133,14 +360,39 @@ class GridWithMark(SquareGrid):
         for i in range(height):
             for j in range(width):
                 self.marks[(j, i)] = [0, 0]
+        # incrementally maintained coverage metrics
+        self.num_marks = 0 # robots currently marked on the grid
+        self.num_settled = 0 # vertices holding a settled robot
+        self.frontier: Set[GridLocation] = set() # unsettled passable vertices next to a settled one
+
+    def is_settled(self, node: GridLocation) -> bool:
+        status = self.marks.get(node)
+        return status is not None and max(status) > MAX_NUM
+
+    def update_frontier(self, node: GridLocation):
+        # only the changed vertex and its 4 neighbors can enter or leave the frontier
+        for point in [node] + self.four_neighbors(node):
+            point = (int(point[0]), int(point[1]))
+            if self.passable(point) and not self.is_settled(point) \
+                and any(self.is_settled(n) for n in self.four_neighbors(point)):
+                self.frontier.add(point)
+            else:
+                self.frontier.discard(point)
     
     def remove_id(self, from_node: GridLocation, id: int) -> int:
         if self.in_bounds((from_node)):
             from_status = self.marks.get(from_node)
-            if from_status[0] == id:
-                from_status[0] = 0
-            elif from_status[1] == id:
-                from_status[1] = 0
+            removed = 0
+            # a settled robot is marked as id + MAX_NUM
+            if from_status[0] == id or from_status[0] == id + MAX_NUM:
+                removed, from_status[0] = from_status[0], 0
+            elif from_status[1] == id or from_status[1] == id + MAX_NUM:
+                removed, from_status[1] = from_status[1], 0
+            if removed:
+                self.num_marks -= 1
+                if removed > MAX_NUM:
+                    self.num_settled -= 1
+                    self.update_frontier(from_node)
             return 1
         else:
             return 0
@@ -156,14 +408,23 @@ class GridWithMark(SquareGrid):
             return 0
         elif to_status[0] == 0:
             to_status[0] = to_val
-            self.marks[to_node] = to_status
-            return 1
         elif to_status[1] == 0:
             to_status[1] = to_val
-            self.marks[to_node] = to_status
-            return 1
+        self.marks[to_node] = to_status
+        self.num_marks += 1
+        if settled:
+            self.num_settled += 1
+            self.update_frontier(to_node)
+        return 1
 
     def add_cir(self, x: float, y: float, r: float):
+        self.walls.update(self.cir_cells(x, y, r))
+
+    def add_tri(self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float):
+        self.walls.update(self.tri_cells(x1, y1, x2, y2, x3, y3))
+
+    def cir_cells(self, x: float, y: float, r: float) -> List[GridLocation]:
+        # vertices a circle of radius r turns into walls
         left = int((x-r) // self.grid_length)
         right = int((x+r) // self.grid_length)
         bottom = int((y-r) // self.grid_length)
@@ -174,12 +435,12 @@ class GridWithMark(SquareGrid):
         up = min(self.height, up+1)
         r_margin = r + ROBOT_RADIUS
 
-        for i in range(left, right):
-            for h in range(bottom, up):
-                if ((x - self.grid_length*(i+0.5))**2 + (y - self.grid_length*(h+0.5))**2) < r_margin**2:
-                    self.walls.append((i, h))
+        i, h = np.meshgrid(np.arange(left, right), np.arange(bottom, up), indexing='ij')
+        inside = ((x - self.grid_length*(i+0.5))**2 + (y - self.grid_length*(h+0.5))**2) < r_margin**2
+        return list(zip(i[inside].tolist(), h[inside].tolist()))
 
-    def add_tri(self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float):
+    def tri_cells(self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float) -> List[GridLocation]:
+        # vertices a triangle turns into walls
         left = int(min(x1, x2, x3) // self.grid_length)
         right = int(max(x1, x2, x3) // self.grid_length)
         bottom = int(min(y1, y2, y3) // self.grid_length)
@@ -189,20 +450,253 @@ class GridWithMark(SquareGrid):
         right = min(self.width, right+1)
         up = min(self.height, up+1)
 
-        for i in range(left, right):
-            for h in range(bottom, up):
-                if in_tri_margin(x1, y1, x2, y2, x3, y3, self.grid_length*(i+0.5), self.grid_length*(h+0.5)):
-                    self.walls.append((i, h))
+        i, h = np.meshgrid(np.arange(left, right), np.arange(bottom, up), indexing='ij')
+        inside = in_tri_margin_grid(x1, y1, x2, y2, x3, y3, self.grid_length*(i+0.5), self.grid_length*(h+0.5))
+        return list(zip(i[inside].tolist(), h[inside].tolist()))
+
+    def add_occupancy(self, occupied: np.ndarray, metres_per_pixel: float,
+                      origin: PointLocation = (.0, .0)) -> np.ndarray:
+        # occupied is indexed by [row, col] with row 0 at the top of the image
+        # a vertex becomes a wall if an occupied pixel lies within ROBOT_RADIUS of its center
+        # return the vertices whose area is mostly occupied, for drawing
+        occupied = np.flipud(occupied)
+        rows, cols = occupied.shape
+        integral = np.zeros((rows+1, cols+1), dtype=np.int64)
+        integral[1:, 1:] = occupied.cumsum(axis=0).cumsum(axis=1)
+
+        def rect_sum(v0, v1, u0, u1):
+            # number of occupied pixels in rows [v0, v1) and cols [u0, u1), clipped to the image
+            v0, v1 = np.clip(v0, 0, rows), np.clip(v1, 0, rows)
+            u0, u1 = np.clip(u0, 0, cols), np.clip(u1, 0, cols)
+            total = integral[v1, u1] - integral[v0, u1] - integral[v1, u0] + integral[v0, u0]
+            return np.where((v1 > v0) & (u1 > u0), total, 0)
+
+        # vertex centers in pixel coordinates
+        px = ((np.arange(self.width) + 0.5) * self.grid_length - origin[0]) / metres_per_pixel
+        py = ((np.arange(self.height) + 0.5) * self.grid_length - origin[1]) / metres_per_pixel
+        px, py = np.meshgrid(px, py, indexing='ij')
+
+        # sweep the dilation disk row by row, measuring distance to the nearest point of each pixel
+        radius = ROBOT_RADIUS / metres_per_pixel
+        base_row = np.floor(py).astype(np.int64)
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        reach = int(math.ceil(radius)) + 1
+        for dv in range(-reach, reach+1):
+            v = base_row + dv
+            dy = np.maximum(0.0, np.abs(v + 0.5 - py) - 0.5)
+            half_width = np.sqrt(np.maximum(0.0, radius**2 - dy**2))
+            u0 = np.ceil(px - half_width - 1).astype(np.int64)
+            u1 = np.floor(px + half_width).astype(np.int64) + 1
+            hit = rect_sum(v, v+1, u0, u1) > 0
+            mask |= hit & (dy <= radius)
+        self.walls.update(map(tuple, np.argwhere(mask).tolist()))
+
+        # fraction of each vertex area that is occupied
+        cell_pixels = self.grid_length / metres_per_pixel
+        u0 = np.round(px - cell_pixels/2).astype(np.int64)
+        v0 = np.round(py - cell_pixels/2).astype(np.int64)
+        u1 = np.maximum(u0 + 1, np.round(px + cell_pixels/2).astype(np.int64))
+        v1 = np.maximum(v0 + 1, np.round(py + cell_pixels/2).astype(np.int64))
+        area = (u1 - u0) * (v1 - v0)
+        return rect_sum(v0, v1, u0, u1) * 2 >= area
+
+# Optional per-vertex statistics of where robots spend their time
+# Updated from Maze.mark_robot transitions only, so robots at rest cost nothing,
+#   and the memory grows with the grid and the number of robots, not with the run length
+class CellHeatmap:
+    def __init__(self, width: int, height: int, flush_size: int = 4096):
+        self.t = 0.0 # current simulation time, set by the swarm every step
+        self.visits = np.zeros((width, height), dtype=np.int64) # entries into a vertex
+        self.dwell = np.zeros((4, width, height), dtype=np.float64) # seconds spent, by status 0..3
+        self.crashes = np.zeros((width, height), dtype=np.int64)
+        self.blocked = np.zeros((width, height), dtype=np.int64) # failed entries at a full source
+        # robot id -> (vertex, status at its last mark, since when)
+        self.robot_state: Dict[int, Tuple[GridLocation, int, float]] = {}
+        self.flush_size = flush_size
+        self.pending_visits: List[GridLocation] = []
+        self.pending_dwell: List[Tuple[int, int, int, float]] = []
+
+    def close_interval(self, robot_id: int):
+        cell, status, since = self.robot_state.pop(robot_id)
+        if status >= 0 and self.t > since:
+            self.pending_dwell.append((status, cell[0], cell[1], self.t - since))
+
+    def record(self, robot_id: int, cell: GridLocation, status: int):
+        # a status reported at a mark lasts until the next mark of the same robot,
+        #   so time in status 1 is counted with the resting status 0 it was marked in
+        cell = (int(cell[0]), int(cell[1]))
+        state = self.robot_state.get(robot_id)
+        if state is not None and state[0] == cell and state[1] == status:
+            return
+        if state is not None:
+            self.close_interval(robot_id)
+        if state is None or state[0] != cell:
+            self.pending_visits.append(cell)
+        self.robot_state[robot_id] = (cell, status, self.t)
+        if len(self.pending_dwell) + len(self.pending_visits) >= self.flush_size:
+            self.flush()
+
+    def record_crash(self, robot_id: int, cell: GridLocation):
+        if robot_id in self.robot_state:
+            self.close_interval(robot_id)
+        if 0 <= cell[0] < self.crashes.shape[0] and 0 <= cell[1] < self.crashes.shape[1]:
+            self.crashes[int(cell[0]), int(cell[1])] += 1
+
+    def flush(self):
+        # apply the buffered transitions in bulk
+        if self.pending_visits:
+            cells = np.array(self.pending_visits, dtype=int)
+            np.add.at(self.visits, (cells[:, 0], cells[:, 1]), 1)
+            self.pending_visits = []
+        if self.pending_dwell:
+            dwell = np.array(self.pending_dwell)
+            np.add.at(self.dwell, (dwell[:, 0].astype(int), dwell[:, 1].astype(int), dwell[:, 2].astype(int)), dwell[:, 3])
+            self.pending_dwell = []
+
+    def export(self) -> Dict[str, np.ndarray]:
+        # arrays indexed by [x, y], including the time of intervals still open
+        self.flush()
+        dwell = self.dwell.copy()
+        for cell, status, since in self.robot_state.values():
+            if status >= 0:
+                dwell[status, cell[0], cell[1]] += self.t - since
+        data = {'visits': self.visits.copy(), 'crashes': self.crashes.copy(), 'blocked': self.blocked.copy(),
+                'dwell': dwell.sum(axis=0)}
+        for status in range(4):
+            data['dwell_{0}'.format(status)] = dwell[status]
+        return data
 
 # The main representation f the world
 class Maze:
-    def __init__(self, height: float, width: float, grid_length: float = 0.5):
+    def __init__(self, height: float, width: float, grid_length: float = 0.5,
+                 surv_occlusion: bool = False):
         self.height = height
         self.width = width
         self.grid_length = grid_length
         self.real_map = RealGraph(width, height, grid_length)
         self.grids = GridWithMark(int(width//grid_length), int(height//grid_length), grid_length)
         self.survivors = []
+        # vertices whose center senses a survivor within SENSORRANGE, rebuilt by add_surv
+        # with surv_occlusion, walls between the vertex and the survivor block the sensing
+        self.surv_occlusion = surv_occlusion
+        self.surv_mask = np.zeros((self.grids.width, self.grids.height), dtype=bool)
+        self.surv_ids: Dict[GridLocation, List[int]] = {}
+        self.surv_version = 0
+        self.heatmap = None # optional CellHeatmap, see enable_heatmap
+        # cached at freeze time, see freeze()
+        self.source = None
+        self.dist_field = None
+        self.diagonal = True
+        self.optimal_distance = None
+        # obstacles added during a run, see add_obstacle
+        self.obstacle_cells: Dict[int, List[GridLocation]] = {} # obstacle id -> vertices it covers
+        self.obstacle_walls: Dict[GridLocation, int] = {} # walls made by obstacles -> obstacles covering them
+        self.next_obstacle = 1
+
+    def freeze(self, source: List, diagonal: bool = True):
+        # build the distance field from the source, or a list of sources, once the geometry is complete
+        sources = source if np.ndim(source) == 2 else [source]
+        self.source = [(float(s[0]), float(s[1])) for s in sources]
+        starts = [(int(s[0] // self.grid_length), int(s[1] // self.grid_length)) for s in sources]
+        self.dist_field = self.grids.distance_field(starts, diagonal)
+        self.diagonal = diagonal
+        self.optimal_distance = None
+
+    def source_cells(self) -> List[GridLocation]:
+        return [(int(s[0] // self.grid_length), int(s[1] // self.grid_length)) for s in self.source]
+
+    def enable_heatmap(self):
+        self.heatmap = CellHeatmap(self.grids.width, self.grids.height)
+
+    def mark_blocked_entry(self, v_x: int, v_y: int):
+        # a robot could not enter because the source vertex is full
+        if self.heatmap is not None and self.grids.in_bounds((v_x, v_y)):
+            self.heatmap.blocked[v_x, v_y] += 1
+
+    def content_hash(self) -> str:
+        # identifies the geometry, the wall grid and the survivors, not the robots on it
+        geometry = json.dumps([self.width, self.height, self.grid_length,
+                               self.real_map.circles, self.real_map.triangles,
+                               self.real_map.rectangles, self.survivors], default=float)
+        digest = hashlib.sha256(geometry.encode())
+        if self.real_map.dynamic:
+            digest.update(json.dumps(sorted(self.real_map.dynamic.items()), default=float).encode())
+        digest.update(np.packbits(self.grids.wall_mask()).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path: str) -> 'Maze':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def save_geometry(self, path: str, **extra):
+        # compact form of the maze without the robot marks, extra arrays are stored alongside
+        # the distance field of a frozen maze is kept with its sources
+        if self.dist_field is not None:
+            extra = {'dist_field': self.dist_field, 'source': np.array(self.source, dtype=float),
+                     'diagonal': np.array(self.diagonal), **extra}
+        np.savez_compressed(path, size=np.array([self.height, self.width, self.grid_length]),
+                            walls=np.array(sorted(self.grids.walls), dtype=np.int32).reshape(-1, 2),
+                            circles=np.array([[c[0], c[1], r] for c, r in self.real_map.circles]).reshape(-1, 3),
+                            triangles=np.array(self.real_map.triangles, dtype=float).reshape(-1, 6),
+                            rectangles=np.array(self.real_map.rectangles, dtype=float).reshape(-1, 4),
+                            survivors=np.array(self.survivors, dtype=float).reshape(-1, 2),
+                            surv_occlusion=np.array(self.surv_occlusion), **extra)
+
+    @staticmethod
+    def load_geometry(path: str) -> 'Maze':
+        data = np.load(path)
+        height, width, grid_length = data['size'].tolist()
+        maze = Maze(height, width, grid_length, surv_occlusion=bool(data['surv_occlusion']))
+        maze.grids.walls.update(map(tuple, data['walls'].tolist()))
+        maze.real_map.circles = [((x, y), r) for x, y, r in data['circles'].tolist()]
+        maze.real_map.triangles = [((t[0], t[1]), (t[2], t[3]), (t[4], t[5])) for t in data['triangles'].tolist()]
+        maze.real_map.rectangles = [((x1, y1), (x2, y2)) for x1, y1, x2, y2 in data['rectangles'].tolist()]
+        for x, y in data['survivors'].tolist():
+            maze.add_surv(x, y)
+        if 'dist_field' in data:
+            maze.source = [(x, y) for x, y in data['source'].tolist()]
+            maze.dist_field = data['dist_field']
+            maze.diagonal = bool(data['diagonal'])
+        return maze
+
+    def get_optimal_distance(self) -> float:
+        # shortest distance from the source to a vertex within sensor range of a survivor
+        if self.dist_field is None:
+            print('maze is not frozen, no distance field')
+            return np.inf
+        if self.optimal_distance is None:
+            xs = (np.arange(self.grids.width) + 0.5) * self.grid_length
+            ys = (np.arange(self.grids.height) + 0.5) * self.grid_length
+            best = np.inf
+            for survivor in self.survivors:
+                in_range = (xs[:, None] - survivor[0]) ** 2 + (ys[None, :] - survivor[1]) ** 2 < SENSORRANGE ** 2
+                if in_range.any():
+                    best = min(best, self.dist_field[in_range].min())
+            self.optimal_distance = best
+        return self.optimal_distance
+
+    def path_length_ratio(self, path: List) -> float:
+        # length of the path found by the swarm over the optimal distance, 1.0 is optimal
+        optimal = self.get_optimal_distance()
+        if not path or optimal == np.inf:
+            return np.inf
+        points = np.array(path, dtype=float)
+        length = np.linalg.norm(np.diff(points, axis=0), axis=1).sum()
+        if optimal == 0.0:
+            return 1.0 if length == 0.0 else np.inf
+        return length / optimal
+
+    def dispersion_efficiency(self, num_robot: int) -> float:
+        # robots needed to cover the optimal path over robots that entered the maze
+        optimal = self.get_optimal_distance()
+        if num_robot <= 0 or optimal == np.inf:
+            return 0.0
+        return min(1.0, (optimal / self.grid_length + 1) / num_robot)
     
     def add_rect(self, x1: float, y1: float, x2: float, y2: float):
         self.real_map.add_tri(x1, y1, x2, y2, x1, y2)
@@ -218,8 +712,125 @@ class Maze:
         self.real_map.add_tri(x1, y1, x2, y2, x3, y3)
         self.grids.add_tri(x1, y1, x2, y2, x3, y3)
 
+    def add_occupancy(self, image, metres_per_pixel: float, origin: PointLocation = (.0, .0),
+                      threshold: float = 0.5):
+        # import an occupancy bitmap (PNG path or array) placed with its bottom-left corner at origin
+        occupied = load_occupancy(image, threshold)
+        cells = self.grids.add_occupancy(occupied, metres_per_pixel, origin)
+        # merge occupied vertices of each row into rectangles for drawing
+        gl = self.grid_length
+        padded = np.zeros((cells.shape[0]+2, cells.shape[1]), dtype=np.int8)
+        padded[1:-1] = cells
+        edges = np.diff(padded, axis=0)
+        for y in range(cells.shape[1]):
+            starts = np.nonzero(edges[:, y] == 1)[0]
+            ends = np.nonzero(edges[:, y] == -1)[0]
+            for x1, x2 in zip(starts, ends):
+                self.real_map.add_rect(float(x1*gl), y*gl, float(x2*gl), (y+1)*gl)
+
+    def add_obstacle(self, kind: str, *shape: float) -> Tuple[int, List[GridLocation]]:
+        # add a 'cir' (x, y, r), 'tri' (x1, y1, x2, y2, x3, y3) or 'rect' (x1, y1, x2, y2) obstacle
+        #   during a run, return its id and the vertices that became walls
+        # Swarm.add_obstacle also crashes the robots caught under it
+        if kind == 'cir':
+            x, y, r = shape
+            geometry = ((x, y), r)
+            cells = self.grids.cir_cells(x, y, r)
+        elif kind == 'tri':
+            x1, y1, x2, y2, x3, y3 = shape
+            geometry = ((x1, y1), (x2, y2), (x3, y3))
+            cells = self.grids.tri_cells(x1, y1, x2, y2, x3, y3)
+        elif kind == 'rect':
+            x1, y1, x2, y2 = shape
+            geometry = ((x1, y1), (x2, y2))
+            cells = list(set(self.grids.tri_cells(x1, y1, x2, y2, x1, y2)
+                             + self.grids.tri_cells(x1, y1, x2, y2, x2, y1)))
+        else:
+            raise ValueError('unknown obstacle kind ' + kind)
+        id = self.next_obstacle
+        self.next_obstacle += 1
+        self.obstacle_cells[id] = cells
+        # walls already there stay with their owner, static walls are never removed
+        added = []
+        for cell in cells:
+            if cell in self.obstacle_walls:
+                self.obstacle_walls[cell] += 1
+            elif cell not in self.grids.walls:
+                self.obstacle_walls[cell] = 1
+                added.append(cell)
+        self.real_map.dynamic[id] = (kind, geometry)
+        self.real_map.dynamic_version += 1
+        self.update_walls(shape_box(kind, geometry), added, [])
+        return id, added
+
+    def remove_obstacle(self, id: int) -> List[GridLocation]:
+        # remove an obstacle added with add_obstacle, return the vertices that stopped being walls
+        removed = []
+        for cell in self.obstacle_cells.pop(id):
+            if cell not in self.obstacle_walls:
+                continue
+            self.obstacle_walls[cell] -= 1
+            if self.obstacle_walls[cell] == 0:
+                del self.obstacle_walls[cell]
+                removed.append(cell)
+        kind, geometry = self.real_map.dynamic.pop(id)
+        self.real_map.dynamic_version += 1
+        self.update_walls(shape_box(kind, geometry), [], removed)
+        return removed
+
+    def update_walls(self, box: Tuple[float, float, float, float], added: List[GridLocation],
+                     removed: List[GridLocation]):
+        # bring the walls and everything derived from them up to date around a changed obstacle
+        self.grids.walls.update(added)
+        self.grids.walls.difference_update(removed)
+        for cell in added + removed:
+            self.grids.update_frontier(cell)
+        if self.dist_field is not None and (added or removed):
+            self.grids.repair_distance_field(self.dist_field, self.source_cells(), added, removed, self.diagonal)
+        self.optimal_distance = None
+        if self.surv_occlusion:
+            # line of sight only changes for the survivors within sensor range of the obstacle
+            left, bottom, right, up = box
+            gained = False
+            for surv_id, (x, y) in enumerate(self.survivors):
+                dx = max(left - x, 0.0, x - right)
+                dy = max(bottom - y, 0.0, y - up)
+                if dx ** 2 + dy ** 2 < SENSORRANGE ** 2:
+                    gained = self.update_surv_sensing(surv_id) or gained
+            if gained:
+                self.surv_version += 1
+
     def add_surv(self, x: float, y: float):
         self.survivors.append((x, y))
+        self.optimal_distance = None
+        self.surv_version += 1
+        self.update_surv_sensing(len(self.survivors) - 1)
+
+    def update_surv_sensing(self, surv_id: int) -> bool:
+        # set the vertices that sense a survivor, only the vertices around it change
+        # return whether a vertex newly senses it
+        x, y = self.survivors[surv_id]
+        gained = False
+        gl = self.grid_length
+        left = max(0, int((x - SENSORRANGE) // gl))
+        right = min(self.grids.width, int((x + SENSORRANGE) // gl) + 1)
+        bottom = max(0, int((y - SENSORRANGE) // gl))
+        up = min(self.grids.height, int((y + SENSORRANGE) // gl) + 1)
+        for i in range(left, right):
+            for h in range(bottom, up):
+                center = (gl*(i+0.5), gl*(h+0.5))
+                if (x - center[0]) ** 2 + (y - center[1]) ** 2 >= SENSORRANGE ** 2:
+                    continue
+                ids = self.surv_ids.get((i, h), [])
+                if self.surv_occlusion and self.real_map.segment_blocked(center, (x, y)):
+                    if surv_id in ids:
+                        ids.remove(surv_id)
+                        self.surv_mask[i, h] = len(ids) > 0
+                elif surv_id not in ids:
+                    self.surv_mask[i, h] = True
+                    self.surv_ids.setdefault((i, h), []).append(surv_id)
+                    gained = True
+        return gained
 
     def get_vertex(self, v_x, v_y):
         # get vertex valuex by coordinates
@@ -236,6 +847,12 @@ class Maze:
     
     def get_tris(self):
         return self.real_map.triangles
+
+    def get_rects(self):
+        return self.real_map.rectangles
+
+    def get_obstacles(self):
+        return self.real_map.dynamic
     
     def get_walls(self):
         return self.grids.walls
@@ -249,7 +866,8 @@ class Maze:
         robot_stat = robot.get_status()
         robot_id = robot.get_index()
 
-        prec = 4 if robot_stat == 3 else 1
+        # a robot crashing while moving must be unmarked from the vertex its last move marked
+        prec = 4 if robot_stat == 3 or robot_stat == -1 else 1
         is_settled = True if robot_stat == 2 else False
         is_crashed = True if robot_stat == -1 else False
 
@@ -262,6 +880,10 @@ class Maze:
             add_result = self.grids.add_id(curr_loc, robot_id, is_settled)
             if not add_result:
                 robot.crash(self)
+            elif self.heatmap is not None:
+                self.heatmap.record(robot_id, curr_loc, robot_stat)
+        elif self.heatmap is not None:
+            self.heatmap.record_crash(robot_id, curr_loc)
 
     def robot_get_marked_id(self, robot, dir=-1):
         # return the neighbor's id that is marked by this settled robot
@@ -280,7 +902,23 @@ class Maze:
         vertex_id = self.grids.marks.get((vertex_loc[0], vertex_loc[1]))
         return max(vertex_id) - MAX_NUM 
 
+    def get_surv_ids(self, v_x: int, v_y: int) -> List[int]:
+        # indices of the survivors sensed from a vertex
+        return self.surv_ids.get((v_x, v_y), [])
+
+    def robot_batch_inquiry_surv(self, robots) -> np.ndarray:
+        # sense survivors for settled robots, which sit on vertex centers, with one gather
+        locs = np.array([robot.get_location() for robot in robots], dtype=float).reshape(-1, 2)
+        cells = np.round(locs // self.grid_length).astype(int)
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < self.grids.width) \
+            & (cells[:, 1] >= 0) & (cells[:, 1] < self.grids.height)
+        in_range = np.zeros(len(robots), dtype=bool)
+        in_range[inside] = self.surv_mask[cells[inside, 0], cells[inside, 1]]
+        return in_range
+
     def robot_inquiry_surv(self, robot) -> bool:
+        if robot.get_status() == 2 and robot.get_sensor_range() == SENSORRANGE:
+            return bool(self.robot_batch_inquiry_surv([robot])[0])
         loc = robot.get_location()
         x_r, y_r = loc[0], loc[1]
         range = robot.get_sensor_range()
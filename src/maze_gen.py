@@ -0,0 +1,184 @@
+from typing import List, Tuple
+import hashlib
+import json
+import os
+import numpy as np
+from maze import Maze
+
+# Seeded procedural mazes for scaling studies and benchmarks
+# Walls are drawn at vertex resolution, one vertex thick, and compiled with add_occupancy,
+#   so that no wall is thinner than the grid can represent
+# rubble_field adds its obstacles as true geometry through add_cir and add_tri
+# Every generator returns the maze frozen from a source, with one survivor at the reachable vertex
+#   farthest from it
+
+# Bump when a generator changes, so that cached maps are rebuilt
+GEN_VERSION = 4
+
+def source_vertex(maze: Maze) -> Tuple[int, int]:
+    # free vertex closest to the bottom-left corner within the largest connected region of floor,
+    #   so that the source is never walled into a pocket
+    free = np.argwhere(~maze.grids.wall_mask())
+    if len(free) == 0:
+        raise ValueError('the maze has no free vertex for a source')
+    free = free[np.argsort(free.sum(axis=1), kind='stable')]
+    reached = np.zeros((maze.grids.width, maze.grids.height), dtype=bool)
+    best, best_size, left = None, 0, len(free)
+    for x, y in free.tolist():
+        if left <= best_size:
+            break
+        if reached[x, y]:
+            continue
+        region = maze.grids.distance_field([(x, y)], diagonal=False) < np.inf
+        reached |= region
+        size = int(region.sum())
+        left -= size
+        if size > best_size:
+            best, best_size = (x, y), size
+    if best_size < 2:
+        raise ValueError('no two free vertices of the maze are connected')
+    return best
+
+def border(maze: Maze) -> np.ndarray:
+    # vertex mask indexed by [x, y] with the outer walls set
+    blocked = np.zeros((maze.grids.width, maze.grids.height), dtype=bool)
+    blocked[0, :] = blocked[-1, :] = blocked[:, 0] = blocked[:, -1] = True
+    return blocked
+
+def add_vertex_mask(maze: Maze, blocked: np.ndarray):
+    # blocked is indexed by [x, y] at vertex resolution, one pixel per vertex
+    # every wall of the mask must come out as a wall vertex, the maze has no walls before
+    maze.add_occupancy(np.flipud(blocked.T), maze.grid_length)
+    walls = maze.grids.wall_mask()
+    if (walls != blocked).any():
+        raise RuntimeError('{0} vertices of the mask did not compile to the same walls'.format((walls != blocked).sum()))
+
+def finish(maze: Maze) -> Tuple[Maze, List[float]]:
+    # freeze the maze from the source, the cache keeps the distance field,
+    #   and place the survivor at the reachable vertex farthest from the source
+    gl = maze.grid_length
+    x, y = source_vertex(maze)
+    source = [(x+0.5)*gl, (y+0.5)*gl]
+    maze.freeze(source)
+    dist = np.where(np.isfinite(maze.dist_field), maze.dist_field, -1.0)
+    x, y = np.unravel_index(dist.argmax(), dist.shape)
+    maze.add_surv(float((x+0.5)*gl), float((y+0.5)*gl))
+    return maze, source
+
+def office_floor(width: float = 30.0, height: float = 20.0, room: float = 4.0, corridor: float = 2.0,
+                 door: float = 1.0, grid_length: float = 0.5, seed: int = 0) -> Tuple[Maze, List[float]]:
+    # rows of rooms along horizontal corridors, every room has one door on its corridor side,
+    #   and a hallway along the right side joins the corridors
+    # sizes are rounded to whole vertices, walls are one vertex thick
+    rng = np.random.default_rng(seed)
+    maze = Maze(height, width, grid_length)
+    blocked = border(maze)
+    w, h = blocked.shape
+    room_cells = max(1, int(round(room / grid_length)))
+    corridor_cells = max(1, int(round(corridor / grid_length)))
+    door_cells = min(room_cells, max(1, int(round(door / grid_length))))
+    y = 1
+    while y + room_cells + 1 + corridor_cells <= h - 1:
+        # rooms on rows y .. top-1 between walls on rows y-1 and top, then the corridor above
+        top = y + room_cells
+        x = 0 # left wall of the room
+        while x + room_cells + 1 <= w - 1 - corridor_cells:
+            right = x + room_cells + 1
+            blocked[right, y:top+1] = True
+            blocked[x:right+1, y-1] = True
+            blocked[x:right+1, top] = True
+            door_x = x + 1 + int(rng.integers(0, room_cells - door_cells + 1))
+            blocked[door_x:door_x+door_cells, top] = False
+            x = right
+        y = top + 1 + corridor_cells + 1
+    add_vertex_mask(maze, blocked)
+    return finish(maze)
+
+def rubble_field(width: float = 30.0, height: float = 30.0, density: float = 0.15,
+                 size: float = 0.6, grid_length: float = 0.5, seed: int = 0) -> Tuple[Maze, List[float]]:
+    # random circles and triangles covering about `density` of the floor
+    rng = np.random.default_rng(seed)
+    maze = Maze(height, width, grid_length)
+    add_vertex_mask(maze, border(maze))
+    count = int(density * width * height / (np.pi * (size/2) ** 2))
+    for _ in range(count):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        r = rng.uniform(0.3, 1.0) * size / 2
+        if rng.random() < 0.5:
+            maze.add_cir(x, y, r)
+        else:
+            angles = rng.uniform(0, 2*np.pi, size=3)
+            p = [(x + r*np.cos(a), y + r*np.sin(a)) for a in angles]
+            maze.add_tri(p[0][0], p[0][1], p[1][0], p[1][1], p[2][0], p[2][1])
+    return finish(maze)
+
+def corridors(width: float = 50.0, height: float = 50.0, num_nodes: int = 30, corridor_cells: int = 2,
+              grid_length: float = 0.5, seed: int = 0) -> Tuple[Maze, List[float]]:
+    # solid rock with L-shaped corridors joining random junctions into one connected network
+    rng = np.random.default_rng(seed)
+    maze = Maze(height, width, grid_length)
+    w, h = maze.grids.width, maze.grids.height
+    blocked = np.ones((w, h), dtype=bool)
+    nodes = np.column_stack([rng.integers(1, max(2, w-corridor_cells), num_nodes),
+                             rng.integers(1, max(2, h-corridor_cells), num_nodes)])
+    for k in range(1, num_nodes):
+        (x1, y1), (x2, y2) = nodes[rng.integers(0, k)], nodes[k]
+        blocked[min(x1, x2):max(x1, x2)+corridor_cells, y1:y1+corridor_cells] = False
+        blocked[x2:x2+corridor_cells, min(y1, y2):max(y1, y2)+corridor_cells] = False
+    blocked |= border(maze)
+    add_vertex_mask(maze, blocked)
+    return finish(maze)
+
+def perfect_maze(width: float = 50.0, height: float = 50.0, passage_cells: int = 2,
+                 grid_length: float = 0.5, seed: int = 0) -> Tuple[Maze, List[float]]:
+    # spanning tree of maze cells (iterative randomized depth-first search), one wall vertex thick
+    rng = np.random.default_rng(seed)
+    maze = Maze(height, width, grid_length)
+    w, h = maze.grids.width, maze.grids.height
+    step = passage_cells + 1
+    cols, rows = max(1, (w-1) // step), max(1, (h-1) // step)
+    blocked = np.ones((w, h), dtype=bool)
+    visited = np.zeros((cols, rows), dtype=bool)
+
+    def carve(x0, y0, x1, y1):
+        blocked[x0:x1, y0:y1] = False
+
+    stack = [(0, 0)]
+    visited[0, 0] = True
+    carve(1, 1, 1+passage_cells, 1+passage_cells)
+    while stack:
+        cx, cy = stack[-1]
+        options = [(cx+dx, cy+dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                   if 0 <= cx+dx < cols and 0 <= cy+dy < rows and not visited[cx+dx, cy+dy]]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny = options[rng.integers(len(options))]
+        visited[nx, ny] = True
+        # open the neighbor cell and the wall between the two
+        x0, y0 = 1 + min(cx, nx) * step, 1 + min(cy, ny) * step
+        x1, y1 = 1 + max(cx, nx) * step + passage_cells, 1 + max(cy, ny) * step + passage_cells
+        carve(x0, y0, x1, y1)
+        stack.append((nx, ny))
+    add_vertex_mask(maze, blocked)
+    return finish(maze)
+
+GENERATORS = {'office_floor': office_floor, 'rubble_field': rubble_field,
+              'corridors': corridors, 'perfect_maze': perfect_maze}
+
+def generate(kind: str, cache_dir: str = None, **params) -> Tuple[Maze, List[float]]:
+    # build a map, or load it from cache_dir where maps are keyed by a hash of the parameters
+    if cache_dir is None:
+        return GENERATORS[kind](**params)
+    text = json.dumps({'kind': kind, 'params': params, 'version': GEN_VERSION}, sort_keys=True)
+    key = hashlib.sha256(text.encode()).hexdigest()[:24]
+    path = os.path.join(cache_dir, '{0}_{1}.npz'.format(kind, key))
+    if os.path.exists(path):
+        maze = Maze.load_geometry(path)
+        return maze, list(maze.source[0])
+    maze, source = GENERATORS[kind](**params)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.{0}.tmp.npz'.format(os.getpid())
+    maze.save_geometry(tmp_path)
+    os.replace(tmp_path, path)
+    return maze, source
@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+try:
+    import fcntl
+except ImportError: # not available on Windows, eviction is then unlocked
+    fcntl = None
+
+# On-disk store of dispersion run outcomes, one JSON file per configuration
+# Writes are atomic (temporary file + os.replace), so several worker processes
+#   can share one directory, and reads refresh the file time for LRU eviction
+# The store size is kept in a .size file next to the entries, so writes do not scan the directory
+
+def make_key(maze_hash: str, params: Dict) -> str:
+    text = json.dumps({'maze': maze_hash, 'params': params}, sort_keys=True, default=float)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache:
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+            os.utime(path) # mark as recently used
+            return record
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, record: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(record, f, default=float)
+            size = os.path.getsize(tmp_path)
+            # the running total of the store is updated under the lock, a full scan is
+            #   only needed once it goes over max_bytes
+            with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                path = self.path(key)
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                # read before the replace, a first-time scan must not count the new entry
+                total = self.read_total() + size - old_size
+                os.replace(tmp_path, path)
+                if total > self.max_bytes:
+                    total = self.evict()
+                self.write_total(total)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def read_total(self) -> int:
+        # bytes stored, counted from the files the first time
+        try:
+            with open(os.path.join(self.directory, '.size')) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return sum(size for _, size, _ in self.scan())
+
+    def write_total(self, total: int):
+        with open(os.path.join(self.directory, '.size'), 'w') as f:
+            f.write(str(total))
+
+    def scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        # drop the least recently used entries until the store fits in 90% of max_bytes,
+        #   so that the next scans are far apart, and return the bytes left
+        # called by put with the lock held
+        entries = sorted(self.scan())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
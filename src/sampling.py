@@ -0,0 +1,155 @@
+from typing import Dict, List
+import math
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from maze import Maze
+from swarm import SURVIVOR_FOUND
+from result_cache import ResultCache, make_key
+from experiment import cached_dispersion, run_params
+
+# Adaptive replicate allocation for crash-rate sweeps
+# Each crash rate gets replicates (seed = replicate index) until the confidence interval
+#   of its metric is tight enough, the rest of the budget goes to the widest intervals
+# metric 'time': mean dispersion time of successful runs, target is relative to the mean,
+#   a point whose success probability is surely below min_success has no time to estimate
+# metric 'success': success probability (Wilson interval), target is absolute
+
+def mean_half_width(values: List[float], z: float) -> float:
+    if len(values) < 2:
+        return math.inf
+    return z * statistics.stdev(values) / math.sqrt(len(values))
+
+def wilson_half_width(successes: int, n: int, z: float) -> float:
+    if n == 0:
+        return math.inf
+    p = successes / n
+    return z * math.sqrt(p*(1-p)/n + z**2/(4*n**2)) / (1 + z**2/n)
+
+def wilson_upper(successes: int, n: int, z: float) -> float:
+    # upper end of the Wilson interval of the success probability
+    if n == 0:
+        return 1.0
+    center = (successes / n + z**2/(2*n)) / (1 + z**2/n)
+    return center + wilson_half_width(successes, n, z)
+
+# worker process state, set once by the pool initializer
+_worker = {}
+
+def _init_worker(maze: Maze, maze_hash: str, cache_dir: str, cache_bytes: int):
+    _worker['maze'] = maze
+    _worker['maze_hash'] = maze_hash
+    _worker['cache'] = ResultCache(cache_dir, cache_bytes)
+
+def _replicate(c: float, seed: int, kwargs: Dict) -> Dict:
+    return cached_dispersion(_worker['cache'], _worker['maze'], c=c, seed=seed,
+                             maze_hash=_worker['maze_hash'], **kwargs)
+
+class AdaptiveSweep:
+    def __init__(self, maze: Maze, source: List[float], num_robot: int, crash_rates: List[float],
+                 cache: ResultCache, metric: str = 'time', target: float = 0.05,
+                 confidence: float = 0.95, min_reps: int = 5, max_reps: int = 200,
+                 budget: int = 1000, workers: int = None, step_length: float = .01,
+                 max_step: int = 1000000, stagnation_time: float = None, min_success: float = 0.05):
+        self.maze = maze
+        self.maze_hash = maze.content_hash()
+        self.cache = cache
+        self.crash_rates = list(crash_rates)
+        self.metric = metric
+        self.target = target
+        self.z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        self.min_reps = min_reps
+        self.max_reps = max_reps
+        self.min_success = min_success
+        self.budget = budget
+        self.workers = workers if workers else os.cpu_count()
+        self.kwargs = {'source': source, 'num_robot': num_robot, 'step_length': step_length,
+                       'max_step': max_step, 'stagnation_time': stagnation_time}
+        self.results: Dict[float, List[Dict]] = {c: [] for c in self.crash_rates}
+
+    def half_width(self, c: float) -> float:
+        records = self.results[c]
+        successes = [r for r in records if r['outcome'] == SURVIVOR_FOUND]
+        if self.metric == 'success':
+            return wilson_half_width(len(successes), len(records), self.z)
+        times = [r['t'] for r in successes]
+        width = mean_half_width(times, self.z)
+        return width / statistics.mean(times) if times and width != math.inf else math.inf
+
+    def converged(self, c: float) -> bool:
+        n = len(self.results[c])
+        if n >= self.max_reps:
+            return True
+        if n < self.min_reps:
+            return False
+        if self.metric == 'time':
+            successes = sum(r['outcome'] == SURVIVOR_FOUND for r in self.results[c])
+            if wilson_upper(successes, n, self.z) < self.min_success:
+                return True
+        return self.half_width(c) <= self.target
+
+    def priority(self, c: float):
+        # widest interval first, a point without an interval yet only after all the others,
+        #   the one with the fewest replicates first among those
+        width = self.half_width(c)
+        return (width != math.inf, width if width != math.inf else -len(self.results[c]))
+
+    def resume(self):
+        # load the replicates already in the cache, seeds 0, 1, ... until the first miss
+        for c in self.crash_rates:
+            while len(self.results[c]) < self.max_reps:
+                params = run_params(c=c, seed=len(self.results[c]), **self.kwargs)
+                record = self.cache.get(make_key(self.maze_hash, params))
+                if record is None:
+                    break
+                self.results[c].append(record)
+
+    def next_point(self, pending: Dict[float, int]):
+        # fill every point up to min_reps first, then the widest open interval
+        open_points = [c for c in self.crash_rates
+                       if not self.converged(c) and len(self.results[c]) + pending[c] < self.max_reps]
+        if not open_points:
+            return None
+        starving = [c for c in open_points if len(self.results[c]) + pending[c] < self.min_reps]
+        if starving:
+            return min(starving, key=lambda c: len(self.results[c]) + pending[c])
+        idle = [c for c in open_points if pending[c] == 0]
+        return max(idle if idle else open_points, key=self.priority)
+
+    def run(self) -> Dict[float, Dict]:
+        self.resume()
+        pending = {c: 0 for c in self.crash_rates}
+        next_seed = {c: len(self.results[c]) for c in self.crash_rates}
+        futures = {}
+        spent = 0
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.maze, self.maze_hash, self.cache.directory,
+                                           self.cache.max_bytes)) as pool:
+            while True:
+                while len(futures) < self.workers and spent < self.budget:
+                    c = self.next_point(pending)
+                    if c is None:
+                        break
+                    futures[pool.submit(_replicate, c, next_seed[c], self.kwargs)] = c
+                    pending[c] += 1
+                    next_seed[c] += 1
+                    spent += 1
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    c = futures.pop(future)
+                    pending[c] -= 1
+                    self.results[c].append(future.result())
+        return self.summary()
+
+    def summary(self) -> Dict[float, Dict]:
+        table = {}
+        for c in self.crash_rates:
+            records = self.results[c]
+            times = [r['t'] for r in records if r['outcome'] == SURVIVOR_FOUND]
+            table[c] = {'n': len(records), 'success_prob': len(times) / len(records) if records else math.nan,
+                        'success_half_width': wilson_half_width(len(times), len(records), self.z),
+                        'mean_time': statistics.mean(times) if times else math.nan,
+                        'time_half_width': mean_half_width(times, self.z)}
+        return table
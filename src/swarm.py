@@ -1,18 +1,28 @@
-from typing import Dict, List, Iterator, Tuple, TypeVar
+from typing import Dict, List, Iterator, Set, Tuple, TypeVar
 import math
 import random
 import copy
 import numpy as np
 from maze import Maze, unit_vector, MAX_NUM, ROBOT_RADIUS, SENSORRANGE
+from collision import CollisionEngine
 
 # Maze and Swarm keep global information, but 
 #   every MobileRobot instance can only access its local information
 # Robot only records the continous coordinates
 
+# outcome of a dispersion run, returned by Swarm.rand_step_update
+RUNNING = 0
+SURVIVOR_FOUND = 1
+DEADLOCK = 2 # no robot can move or enter anymore
+STAGNATION = 3 # no new vertex settled within the stagnation window
+
+# vertex offset of every neighbor_dir 0, 1, 2, 3: left, down, right, up
+DIR_OFFSET = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+
 class MobileRobot:
     def __init__(self, index: int = 1, location: List[float] = [.0,.0], 
                  source: List[float] = [1.0,1.0], status: int = 0
-                 , grid_length: float = 0.5, step_length: float = 0.01):
+                 , grid_length: float = 0.5, step_length: float = 0.01, c: float = .0):
         self.index = index # 1 <= index < MAX_NUM
         self.location = np.array(location)
         self.prev_location = np.array(location)
@@ -31,7 +41,9 @@ class MobileRobot:
         self.find_surv = False
         self.next_in_path = -1
         self.sensor_range = SENSORRANGE
-        self.c = .0 # crash rate
+        self.c = c # crash rate
+        self.rng = random # random source for crashes, the swarm shares its seeded generator
+        self.status_count = None # shared per-status counters of the swarm
     
     # status 0: the robot is not activated
     # status 1: the robot is activated and at rest
@@ -52,6 +64,12 @@ class MobileRobot:
     def get_status(self):
         return self.status
     
+    def set_status(self, status: int):
+        if self.status_count is not None:
+            self.status_count[self.status] -= 1
+            self.status_count[status] += 1
+        self.status = status
+
     def get_index(self):
         return self.index
     
@@ -74,22 +92,46 @@ class MobileRobot:
     
     def is_source_open(self, maze, x, y):
         ver_s = maze.get_vertex(x, y)
+        if not maze.grids.passable((x, y)):
+            return False # covered by an obstacle
         if sum(item > 0 for item in ver_s) < 2:
             return True
         return False
         
+    def get_vertex(self):
+        # the vertex the robot is marked on while not moving
+        loc = np.round(np.round(self.location, 1) // self.grid_length)
+        return (loc[0], loc[1])
+
+    def has_settled(self, maze, dir: int = -1) -> bool:
+        # whether its vertex, or the neighbor in dir, holds a settled robot
+        x, y = self.get_vertex()
+        if dir != -1:
+            x, y = x + DIR_OFFSET[dir][0], y + DIR_OFFSET[dir][1]
+        marks = maze.get_vertex(x, y)
+        return marks is not None and any(mark > MAX_NUM for mark in marks)
+
     def receive_surv_info(self, last_dir: int, maze, swarm):
+        # return 1 if the information has reached a root
         self.find_surv = True
         self.next_in_path = (last_dir + 2) % 4
-        if np.linalg.norm(self.location - self.source) < 0.001:
+        if swarm.is_root(self.index):
             print('info has reached the source')
+            swarm.path_root = self.index
             return 1
-        else:
-            return self.send_surv_info(maze, swarm)
+        return 0
 
     def send_surv_info(self, maze, swarm):
-        next_id = maze.robot_get_marked_id(self)
-        return swarm.robot_list[next_id-1].receive_surv_info(self.direction, maze, swarm)
+        # walk the settled chain up to the root, a chain that is cut or loops back ends the walk
+        robot, visited = self, {self.index}
+        while True:
+            next_id = maze.robot_get_marked_id(robot)
+            if next_id <= 0 or next_id in visited:
+                return 0
+            visited.add(next_id)
+            last_dir, robot = robot.direction, swarm.robot_list[next_id-1]
+            if robot.receive_surv_info(last_dir, maze, swarm):
+                return 1
 
     def search_surv(self, maze, swarm):
         if self.status != 2:
@@ -103,40 +145,52 @@ class MobileRobot:
     def activate(self, maze) -> int:
         global activation_count
         if self.status == 0:
-            self.status = 1
+            self.set_status(1)
             if not self.first_activated:
                 s_x = int(self.source[0] // self.grid_length)
                 s_y = int(self.source[1] // self.grid_length)
                 ver_source = maze.get_vertex(s_x, s_y)
                 source_count = sum(id > 0 for id in ver_source)
-                if source_count < 2:
+                if source_count < 2 and maze.grids.passable((s_x, s_y)):
                     self.location = copy.deepcopy(self.source)
                     self.first_activated = True
                     if source_count == 0:
-                        self.status = 2 # first robot entering the maze
+                        self.set_status(2) # first robot entering the maze
                         self.upload_maze(maze)
                         return self.index
                     self.upload_maze(maze)
                 else:
-                    self.status = 0 # source is filled, cannot insert now
+                    self.set_status(0) # source is filled, cannot insert now
+                    maze.mark_blocked_entry(s_x, s_y)
                     return 0
         return 0
     
-    def crash(self, maze: Maze):
-        if self.status != 0 and self.status != 2:
+    def crash(self, maze: Maze, force: bool = False):
+        # force also crashes a robot at rest or settled, e.g. under a new obstacle
+        if self.status != -1 and (force or (self.status != 0 and self.status != 2)):
             print('robot {0} has crashed'.format(self.index))
-            self.status = -1
+            self.set_status(-1)
             self.direction = -1
             self.prev_location = self.location
             self.upload_maze(maze)
 
+    def unsettle(self, maze: Maze):
+        # its chain to the root was cut, it rests on its vertex until it can settle again
+        if self.status == 2:
+            self.set_status(0)
+            self.direction = -1
+            self.find_surv = False
+            self.next_in_path = -1
+            self.prev_location = self.location
+            self.upload_maze(maze)
+
     def crash_with_prob(self, maze: Maze):
-        if self.c > .002 and random.random() < self.c:
+        if self.c > .002 and self.rng.random() < self.c:
             self.crash(maze)
         
     def deactivate(self):
         if self.status == 1 or self.status == 3:
-            self.status = 0
+            self.set_status(0)
     
     def cont_move(self, maze: Maze, swarm) -> int:
         if self.status == 2:
@@ -149,78 +203,120 @@ class MobileRobot:
             if np.linalg.norm(self.move_target - self.location) < 0.001:
                 if not self.settled_after_moving:
                     self.deactivate() # move complete
+                elif self.has_settled(maze) or \
+                        (self.planned_direction != -1 and not self.has_settled(maze, self.planned_direction)):
+                    self.deactivate() # a root entered here, or the robot it would point to was unsettled
                 else:
-                    self.status = 2 # move complete and settled
+                    self.set_status(2) # move complete and settled
                     self.direction = self.planned_direction   
             maze.mark_robot(self)
             return 1
-        else:
-            is_wall, neighbor_count, neighbor_dir = maze.robot_inquiry_general(self, swarm)
+
+        plan = self.plan_move(maze, swarm)
+        if plan is None:
+            return 2
+        if plan[0] is None:
+            # settle in place
+            self.set_status(2)
+            self.direction = plan[2]
+            self.prev_location = copy.deepcopy(self.location)
+            maze.mark_robot(self)
+            return 1
+        self.move_vector, self.settled_after_moving, planned_direction = plan
+        if self.settled_after_moving:
+            self.planned_direction = planned_direction
+        self.move_target = self.location + self.move_vector * self.grid_length
+        self.set_status(3)
+        return 1
+
+    def plan_move(self, maze: Maze, swarm):
+        # decide the next move of a robot at rest without changing its state
+        # return (move_vector, settle after moving, planned_direction), or None if no legal move
+        # a move_vector of None settles in place
+        if not self.has_settled(maze):
+            # its vertex lost its settled robot (see Swarm.unsettle_below), it settles there as the
+            #   root of a source or below a settled neighbor, so that every chain still ends at a root
+            if self.get_vertex() in swarm.source_cells(maze):
+                return None, True, -1
+            for dir in range(4):
+                if self.has_settled(maze, dir):
+                    return None, True, dir
+            return None
+        is_wall, neighbor_count, neighbor_dir = maze.robot_inquiry_general(self, swarm)
 
         # check settled neighbor (1 grid away)
         if neighbor_dir[5] == 2:
-            self.move_vector = np.array([-1.0, .0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            return 1
+            return np.array([-1.0, .0]), False, -1
         elif neighbor_dir[9] == 3:
-            self.move_vector = np.array([.0, -1.0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            return 1
+            return np.array([.0, -1.0]), False, -1
         elif neighbor_dir[6] == 0:
-            self.move_vector = np.array([1.0, .0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            return 1
+            return np.array([1.0, .0]), False, -1
         elif neighbor_dir[2] == 1:
-            self.move_vector = np.array([.0, 1.0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            return 1
-        
+            return np.array([.0, 1.0]), False, -1
+
         # check empty point (1 grid away)
-        if not is_wall[5] and neighbor_count[5] == 0 and neighbor_count[4] == 0: 
-            self.move_vector = np.array([-1.0, .0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            self.settled_after_moving = True
-            self.planned_direction = 2
-            return 1
+        if not is_wall[5] and neighbor_count[5] == 0 and neighbor_count[4] == 0:
+            return self.settle_plan(maze, swarm, np.array([-1.0, .0]), 2)
         elif not is_wall[9] and neighbor_count[9] == 0 and neighbor_count[11] == 0:
-            self.move_vector = np.array([.0, -1.0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            self.settled_after_moving = True
-            self.planned_direction = 3
-            return 1
+            return self.settle_plan(maze, swarm, np.array([.0, -1.0]), 3)
         elif not is_wall[6] and neighbor_count[6] == 0 and neighbor_count[7] == 0:
-            self.move_vector = np.array([1.0, .0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            self.settled_after_moving = True
-            self.planned_direction = 0
-            return 1
+            return self.settle_plan(maze, swarm, np.array([1.0, .0]), 0)
         elif not is_wall[2] and neighbor_count[2] == 0 and neighbor_count[0] == 0:
-            self.move_vector = np.array([.0, 1.0])
-            self.move_target = self.location + self.move_vector * self.grid_length 
-            self.status = 3
-            self.settled_after_moving = True
-            self.planned_direction = 1
-            return 1
-        return 2
+            return self.settle_plan(maze, swarm, np.array([.0, 1.0]), 1)
+        return None
+
+    def settle_plan(self, maze: Maze, swarm, move_vector: np.ndarray, direction: int):
+        # only a root settles on a source, the chains of a crashed root still point at it
+        x, y = self.get_vertex()
+        if (x + move_vector[0], y + move_vector[1]) in swarm.source_cells(maze):
+            direction = -1
+        return move_vector, True, direction
 
 class Swarm:
     def __init__(self, step_length: float = 0.01,
-                 t: float = 0.0):
+                 t: float = 0.0, stagnation_time: float = None,
+                 deadlock_check_time: float = 1.0, metrics_interval: float = 1.0,
+                 seed: int = None):
         self.robot_list = [] # swarm id starts from 1
         self.survivor_found = False
-        self.last_has_entered = 0
+        self.outcome = RUNNING
+        self.rng = np.random.default_rng(seed)
+        self.last_has_entered = 0 # robots that tried to enter, over all sources
         self.step_length = step_length
         self.t = t
         self.step_count = 0
-        self.source_id = -1
+        self.source_id = -1 # root of the first source
+        # every source has its own queue of robot ids, entering in order, and its settled root
+        self.sources: List[List[float]] = []
+        self.queues: List[List[int]] = []
+        self.queue_heads: List[int] = []
+        self.roots: Dict[int, int] = {} # source index -> id of the robot settled on it
+        self.lost_roots: Set[int] = set() # sources whose root was crashed by an obstacle
+        self.path_root = -1 # root reached by the survivor information
+        self.entered: List[int] = [] # ids of robots that have entered the maze
         self.step_per_crash = int(30.0/self.step_length)
+        # early termination: stagnation_time is in seconds, None disables it
+        self.stagnation_time = stagnation_time
+        self.last_settled_t = t
+        self.step_per_deadlock_check = max(1, int(deadlock_check_time/self.step_length))
+        # number of robots in each status, maintained by MobileRobot.set_status
+        self.status_count: Dict[int, int] = {-1: 0, 0: 0, 1: 0, 2: 0, 3: 0}
+        # coverage time series, one sample every step_per_metrics steps
+        self.step_per_metrics = max(1, int(metrics_interval/self.step_length))
+        self.metrics: List[Tuple[float, float, int, int, int, int]] = []
+        self.newly_settled: List[MobileRobot] = [] # robots settled during the current step
+        self.surv_version = 0 # survivors seen by the settled robots, see Maze.surv_version
+        self.collision = None # optional continuous collision engine, see enable_collision
+        self.failure_model = None # optional precomputed crash schedule, see set_failure_model
+
+    def enable_collision(self, maze: Maze, cell_size: float = None):
+        # crash moving robots against the true obstacle geometry and each other
+        self.collision = CollisionEngine(maze, cell_size if cell_size else maze.grid_length)
+
+    def set_failure_model(self, model):
+        # replaces the per-robot crash_with_prob polling, call after adding the robots
+        self.failure_model = model
+        model.start(self)
 
     def get_num(self) -> int:
         return len(self.robot_list)
@@ -242,61 +338,225 @@ class Swarm:
             return -1
         else:
             self.robot_list.append(robot)
+            robot.status_count = self.status_count
+            robot.rng = self.rng
+            self.status_count[robot.get_status()] += 1
             return 1
         
-    def add_robot_batch(self, num_robot: int, maze_source: List[float]):
-        if num_robot > MAX_NUM:
+    def add_robot_batch(self, num_robot: int, maze_source: List[float], c: float = .0):
+        # add a source with its own queue of num_robot robots
+        if len(self.robot_list) + num_robot >= MAX_NUM:
             print('cannot add, too many robots')
         else:
+            queue = []
             for i in range(num_robot):
-                robot_id = i+1
-                self.add_robot(MobileRobot(index=robot_id, location=[-1, -1], 
-                                           source= maze_source, status=0, step_length=self.step_length))
+                robot_id = len(self.robot_list) + 1
+                if self.add_robot(MobileRobot(index=robot_id, location=[-1, -1], 
+                                              source= maze_source, status=0, step_length=self.step_length, c=c)) == 1:
+                    queue.append(robot_id)
+            self.sources.append(maze_source)
+            self.queues.append(queue)
+            self.queue_heads.append(0)
+
+    def add_obstacle(self, maze: Maze, kind: str, *shape: float) -> int:
+        # add an obstacle during the run (see Maze.add_obstacle) and crash the robots it falls on,
+        #   including those moving into it
+        id, added = maze.add_obstacle(kind, *shape)
+        added = set(added)
+        nearby = {(x+dx, y+dy) for (x, y) in added for dx, dy in [(0, 0), (-1, 0), (0, 1), (1, 0), (0, -1)]}
+        cut = [] # vertices whose settled robot was crashed, except the roots
+        for cell in nearby:
+            for mark in list(maze.grids.marks.get(cell, [])):
+                if mark <= 0:
+                    continue
+                robot = self.robot_list[(mark - MAX_NUM if mark > MAX_NUM else mark) - 1]
+                if robot.get_status() == 3:
+                    target = np.round(np.round(robot.move_target, 4) // maze.grid_length)
+                    caught = cell in added or (int(target[0]), int(target[1])) in added
+                else:
+                    caught = cell in added
+                if caught:
+                    if robot.get_status() == 2 and not self.is_root(robot.get_index()):
+                        cut.append(robot.get_vertex())
+                    robot.crash(maze, force=True)
+                    self.drop_root(robot.get_index())
+        self.unsettle_below(maze, cut)
+        return id
+
+    def unsettle_below(self, maze: Maze, cells: List[Tuple[int, int]]):
+        # unsettle the settled robots whose chain passes through the cells, they settle again
+        #   from the remaining chains instead of pointing at an empty vertex
+        while cells:
+            x, y = cells.pop()
+            for dir, (dx, dy) in enumerate(DIR_OFFSET):
+                for mark in list(maze.get_vertex(x+dx, y+dy) or []):
+                    if mark > MAX_NUM and self.get_robot_dir(mark - MAX_NUM) == (dir + 2) % 4:
+                        self.robot_list[mark - MAX_NUM - 1].unsettle(maze)
+                        cells.append((x+dx, y+dy))
+
+    def drop_root(self, id: int):
+        # a crashed root leaves its source without root until a robot settles there again
+        for k in [k for k, root in self.roots.items() if root == id]:
+            del self.roots[k]
+            self.lost_roots.add(k)
+        if self.source_id == id:
+            self.source_id = -1
+
+    def adopt_roots(self, maze: Maze):
+        # the robot now settled on a source that lost its root becomes the new root
+        for k in list(self.lost_roots):
+            s_x = int(self.sources[k][0] // maze.grid_length)
+            s_y = int(self.sources[k][1] // maze.grid_length)
+            settled = [mark - MAX_NUM for mark in maze.get_vertex(s_x, s_y) if mark > MAX_NUM]
+            if settled:
+                self.set_root(k, settled[0])
+        if self.source_id == -1 and 0 in self.roots:
+            self.source_id = self.roots[0]
+
+    def set_root(self, k: int, id: int):
+        # a source that lost its root gets a new one, all the settled robots sense again
+        #   since a report may have been dropped while the source had no root
+        if k in self.lost_roots:
+            self.lost_roots.discard(k)
+            self.surv_version = -1
+        self.roots[k] = id
+
+    def source_cells(self, maze: Maze) -> List[Tuple[int, int]]:
+        return [(int(s[0] // maze.grid_length), int(s[1] // maze.grid_length)) for s in self.sources]
+
+    def get_sources(self) -> List[List[float]]:
+        return self.sources
+
+    def is_root(self, id: int) -> bool:
+        return id in self.roots.values()
         
     def rand_step_update(self, maze: Maze):
-        if self.survivor_found:
-            return 1
+        if self.outcome != RUNNING:
+            return self.outcome
         else:
             self.t += self.step_length
             self.step_count += 1
+            if maze.heatmap is not None:
+                maze.heatmap.t = self.t
+            num_settled = self.status_count[2]
+            self.newly_settled = []
             self.rand_activation(maze)
-            for robot in self.robot_list:
-                if self.step_count % self.step_per_crash == 0:
+            if self.failure_model is not None:
+                self.failure_model.apply(self, maze)
+            poll_crash = self.failure_model is None and self.step_count % self.step_per_crash == 0
+            # robots waiting outside the maze neither move nor crash
+            for id in self.entered:
+                robot = self.robot_list[id-1]
+                if poll_crash:
                     robot.crash_with_prob(maze)
-                robot.cont_move(maze, self)
-                result = robot.search_surv(maze, self)
-                if result:
-                    self.survivor_found = True
-                    print('dispersion ends at {0} s'.format(self.t))
-                    return 1
-            return 0
+                if robot.cont_move(maze, self) == 1 and robot.get_status() == 2:
+                    self.newly_settled.append(robot)
+                if self.collision is not None:
+                    self.collision.update_robot(robot)
+            if self.collision is not None:
+                self.collision.detect(maze, self.t)
+            if self.lost_roots:
+                self.adopt_roots(maze)
+            # settled robots never move, so only the newly settled ones need to sense,
+            # unless survivors were added since the last step
+            if self.surv_version != maze.surv_version:
+                self.surv_version = maze.surv_version
+                self.newly_settled = [robot for robot in self.robot_list if robot.get_status() == 2]
+            if self.newly_settled:
+                in_range = maze.robot_batch_inquiry_surv(self.newly_settled)
+                for robot in [r for r, hit in zip(self.newly_settled, in_range) if hit]:
+                    if robot.search_surv(maze, self):
+                        self.survivor_found = True
+                        self.outcome = SURVIVOR_FOUND
+                        print('dispersion ends at {0} s'.format(self.t))
+                        self.record_metrics(maze)
+                        return self.outcome
+            if self.status_count[2] > num_settled:
+                self.last_settled_t = self.t
+            if self.step_count % self.step_per_metrics == 0:
+                self.record_metrics(maze)
+            if self.stagnation_time is not None and self.t - self.last_settled_t > self.stagnation_time:
+                self.outcome = STAGNATION
+                print('dispersion stagnated at {0} s'.format(self.t))
+            elif self.status_count[3] == 0 and self.step_count % self.step_per_deadlock_check == 0 \
+                    and self.is_quiescent(maze):
+                self.outcome = DEADLOCK
+                print('dispersion deadlocked at {0} s'.format(self.t))
+            return self.outcome
+
+    def is_quiescent(self, maze: Maze) -> bool:
+        # no robot is moving, no robot at rest has a legal move and no robot can still enter
+        for id in self.entered:
+            robot = self.robot_list[id-1]
+            status = robot.get_status()
+            if status == 3:
+                return False
+            elif (status == 0 or status == 1) and robot.get_activated_once():
+                if self.failure_model is not None:
+                    if self.failure_model.pending():
+                        return False # it may still crash and free its vertex
+                elif robot.c > .002:
+                    return False
+                if robot.plan_move(maze, self) is not None:
+                    return False
+        for k, queue in enumerate(self.queues):
+            waiting = next((id for id in queue[self.queue_heads[k]:]
+                            if not self.robot_list[id-1].get_activated_once()), None)
+            if waiting is not None:
+                s_x = int(self.sources[k][0] // maze.grid_length)
+                s_y = int(self.sources[k][1] // maze.grid_length)
+                if self.robot_list[waiting-1].is_source_open(maze, s_x, s_y):
+                    return False
+        return True
                          
     def rand_activation(self, maze, rate=1, ind_priority=1):
         # rate: lambda
         # step_length: the smallest time step in simulation
         beta = 1.0/rate
-        num_robot = len(self.robot_list)
-        rv_list = np.random.default_rng().exponential(scale=beta, size=num_robot)
-        activation_id = np.array([rv < self.step_length for rv in rv_list])
         if not ind_priority:
+            num_robot = len(self.robot_list)
+            rv_list = self.rng.exponential(scale=beta, size=num_robot)
+            activation_id = np.array([rv < self.step_length for rv in rv_list])
             for i in range(num_robot):
                 if activation_id[i]:
-                    self.robot_list[i].activate(maze)
+                    robot = self.robot_list[i]
+                    entered = robot.get_activated_once()
+                    if robot.activate(maze):
+                        self.set_root(self.source_of(robot), robot.get_index())
+                        self.newly_settled.append(robot)
+                    if not entered and robot.get_activated_once():
+                        self.entered.append(robot.get_index())
         else:
-            for i in range(num_robot):
-                if activation_id[i]:
-                    if self.robot_list[i].get_activated_once():
-                        self.robot_list[i].activate(maze)
-                    elif self.last_has_entered == i:
-                        id = self.robot_list[i].activate(maze)
-                        if id != 0:
-                            self.source_id = id
-                        self.last_has_entered += 1
+            # robots already in the maze, then the head of every source queue
+            rv_list = self.rng.exponential(scale=beta, size=len(self.entered))
+            for id in np.array(self.entered)[rv_list < self.step_length]:
+                self.robot_list[id-1].activate(maze)
+            rv_list = self.rng.exponential(scale=beta, size=len(self.queues))
+            for k, queue in enumerate(self.queues):
+                if rv_list[k] >= self.step_length or self.queue_heads[k] >= len(queue):
+                    continue
+                robot = self.robot_list[queue[self.queue_heads[k]]-1]
+                id = robot.activate(maze)
+                if id != 0:
+                    self.set_root(k, id)
+                    self.newly_settled.append(robot)
+                if robot.get_activated_once():
+                    self.entered.append(robot.get_index())
+                self.queue_heads[k] += 1
+                self.last_has_entered += 1
+        if self.source_id == -1 and 0 in self.roots:
+            self.source_id = self.roots[0]
+
+    def source_of(self, robot: MobileRobot) -> int:
+        for k, source in enumerate(self.sources):
+            if np.linalg.norm(np.array(source) - robot.source) < 0.001:
+                return k
+        return -1
 
     def get_path_to_surv(self, maze) -> List:
         path = []
         if self.survivor_found: 
-            id = self.source_id
+            id = self.path_root if self.path_root != -1 else self.source_id
             next_in_path = self.robot_list[id-1].get_next_in_path()
             path.append(self.robot_list[id-1].get_location())
             while next_in_path != -1:
@@ -314,11 +574,25 @@ class Swarm:
         return count
     
     def count_crashed(self):
-        count = 0
-        for robot in self.robot_list:
-            if robot.get_status() == -1:
-                count += 1
-        return count
+        return self.status_count[-1]
+
+    def count_in_transit(self):
+        return self.status_count[3]
+
+    def get_coverage(self, maze: Maze) -> float:
+        # fraction of passable vertices that hold a settled robot
+        return maze.grids.num_settled / max(1, maze.grids.count_passable())
+
+    def record_metrics(self, maze: Maze):
+        self.metrics.append((self.t, self.get_coverage(maze), len(maze.grids.frontier),
+                             self.status_count[3], self.status_count[2], self.status_count[-1]))
+
+    def export_metrics(self) -> Dict[str, np.ndarray]:
+        # time series of t, coverage, frontier size, robots in transit, settled and crashed robots
+        data = np.array(self.metrics, dtype=np.float64).reshape(-1, 6)
+        return {'t': data[:, 0], 'coverage': data[:, 1].astype(np.float32),
+                'frontier': data[:, 2].astype(np.int32), 'in_transit': data[:, 3].astype(np.int32),
+                'settled': data[:, 4].astype(np.int32), 'crashed': data[:, 5].astype(np.int32)}
 
 
         